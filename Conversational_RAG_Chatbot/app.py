@@ -1,7 +1,6 @@
 import streamlit as st
-import tempfile
-from pathlib import Path
-from rag_chatbot import ingest_documents, query, clear_session
+from uuid import uuid4
+from rag_chatbot import ingest_files, stream_query, clear_session, session_collection_prefix
 
 # Set page config
 st.set_page_config(page_title="RAG Chatbot", page_icon="🤖")
@@ -11,6 +10,10 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "documents_ingested" not in st.session_state:
     st.session_state.documents_ingested = False
+if "session_id" not in st.session_state:
+    # Each browser session gets its own chat history and document collection
+    st.session_state.session_id = f"{session_collection_prefix}{uuid4().hex[:12]}"
+session_id = st.session_state.session_id
 
 # Get API key from secrets
 try:
@@ -33,24 +36,29 @@ with st.sidebar:
 
     if uploaded_files and st.button("Process PDFs"):
         with st.spinner("Processing PDFs..."):
-            # Create temporary directory for uploaded PDFs
-            temp_dir = tempfile.mkdtemp()
-            for uploaded_file in uploaded_files:
-                file_path = Path(temp_dir) / uploaded_file.name
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-            
+            progress_bar = st.progress(0.0, text="Reading PDFs...")
+
+            def show_progress(file_name, page, total_pages):
+                progress_bar.progress(page / total_pages, text=f"{file_name}: page {page} / {total_pages}")
+
             try:
-                num_chunks = ingest_documents(temp_dir, GROQ_API_KEY)
+                stats = ingest_files(
+                    uploaded_files, GROQ_API_KEY, progress=show_progress, collection=session_id
+                )
+                progress_bar.empty()
                 st.session_state.documents_ingested = True
                 st.success(f"Processed {len(uploaded_files)} PDF(s)! Ready to chat.")
+                st.caption(
+                    f"Chunks added: {stats['added']}, updated: {stats['updated']}, "
+                    f"skipped: {stats['skipped']}, deleted: {stats['deleted']}"
+                )
             except Exception as e:
                 st.error(f"Error: {str(e)}")
 
     st.divider()
     # Clear chat button
     if st.button("Clear Chat History"):
-        clear_session("default")
+        clear_session(session_id)
         st.session_state.messages = []
         st.rerun()
 
@@ -77,27 +85,32 @@ else:
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get AI response
+        # Stream AI response, showing sources as soon as retrieval finishes
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    answer, sources = query(prompt, GROQ_API_KEY)
-                    st.markdown(answer)
-                    
-                    # Show sources if available
-                    if sources:
-                        with st.expander("📚 Sources:"):
-                            for source in sources:
-                                st.write(f"{source}")
-                        
-                    
-                    # Add assistant response to chat history
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": answer,
-                        "sources": sources
-                    })
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-
- 
\ No newline at end of file
+            try:
+                sources_box = st.empty()
+                sources = []
+
+                def answer_tokens():
+                    for event, value in stream_query(prompt, GROQ_API_KEY, session_id, collection=session_id):
+                        if event == "sources":
+                            sources.extend(value)
+                            if sources:
+                                with sources_box.container():
+                                    with st.expander("📚 Sources:"):
+                                        for source in sources:
+                                            st.write(f"{source}")
+                        elif event == "token":
+                            yield value
+
+                answer = st.write_stream(answer_tokens())
+
+                # Add assistant response to chat history
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": answer,
+                    "sources": sources
+                })
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+
@@ -0,0 +1,136 @@
+"""
+Answer a JSONL file of questions headlessly.
+
+Each input line is {"question": ..., "id": optional, "session_id": optional}.
+Questions that share a session_id are answered in file order within one
+conversation; the rest are independent. Results are appended to the output
+JSONL as they finish, so an interrupted run resumes where it stopped: the
+answered turns of a session are replayed into its history first, so its
+remaining follow-ups see the same conversation as in an uninterrupted run.
+
+    python batch_query.py questions.jsonl results.jsonl --workers 8 --pdf-dir standards
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+import rag_chatbot
+
+
+def read_questions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record.setdefault("id", str(line_no))
+            record["id"] = str(record["id"])
+            record.setdefault("session_id", f"batch-{record['id']}")
+            yield record
+
+
+def completed_answers(path):
+    """{id: answer} of questions already answered without error in an existing output file."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue        # partially written last line of an interrupted run
+            if not record.get("error"):
+                done[record["id"]] = record["answer"]
+    return done
+
+
+def percentile(values, p):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+async def answer_session(records, GROQ_API_KEY, out, latencies, errors):
+    for record in records:
+        start = time.perf_counter()
+        result = {"id": record["id"], "session_id": record["session_id"], "question": record["question"]}
+        try:
+            answer, sources = await rag_chatbot.aquery(record["question"], GROQ_API_KEY, record["session_id"])
+            result.update(answer = answer, sources = sources, error = None)
+        except Exception as e:
+            result.update(answer = None, sources = [], error = f"{type(e).__name__}: {e}")
+            errors.append(record["id"])
+        result["latency_seconds"] = round(time.perf_counter() - start, 4)
+        latencies.append(result["latency_seconds"])
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+
+async def run(input_path, output_path, GROQ_API_KEY, workers):
+    done = completed_answers(output_path)
+    sessions = OrderedDict()
+    answered_turns = {}
+    skipped = 0
+    for record in read_questions(input_path):
+        if record["id"] in done:
+            skipped += 1
+            answered_turns.setdefault(record["session_id"], []).append((record["question"], done[record["id"]]))
+            continue
+        sessions.setdefault(record["session_id"], []).append(record)
+
+    for session_id in sessions:
+        history = rag_chatbot.get_session_history(session_id)
+        for question, answer in answered_turns.get(session_id, []):
+            history.add_user_message(question)
+            history.add_ai_message(answer)
+
+    rag_chatbot.llm_slots = rag_chatbot.FairLock(workers)
+    queue = asyncio.Queue()
+    for records in sessions.values():
+        queue.put_nowait(records)
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def worker():
+            while not queue.empty():
+                await answer_session(queue.get_nowait(), GROQ_API_KEY, out, latencies, errors)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - start
+
+    answered = len(latencies)
+    print(f"Answered {answered} question(s) in {elapsed:.1f}s "
+          f"({answered / elapsed if elapsed else 0:.2f} q/s), "
+          f"{len(errors)} error(s), {skipped} skipped from a previous run")
+    if latencies:
+        print(f"Latency p50 {percentile(latencies, 50):.2f}s, p95 {percentile(latencies, 95):.2f}s, "
+              f"max {max(latencies):.2f}s")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the RAG chatbot")
+    parser.add_argument("input", help="JSONL file with question, optional id and session_id")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=rag_chatbot.max_concurrent_llm_calls)
+    parser.add_argument("--pdf-dir", help="Ingest this directory before answering")
+    parser.add_argument("--api-key", default=os.environ.get("GROQ_API_KEY"), help="Defaults to $GROQ_API_KEY")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("set GROQ_API_KEY or pass --api-key")
+    if args.pdf_dir:
+        print(f"Ingest: {rag_chatbot.ingest_documents(args.pdf_dir, args.api_key)}")
+    asyncio.run(run(args.input, args.output, args.api_key, args.workers))
+
+
+if __name__ == "__main__":
+    main()
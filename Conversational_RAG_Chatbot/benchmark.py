@@ -0,0 +1,289 @@
+"""
+Benchmark ingest and query without calling Groq.
+
+ChatGroq is replaced by a deterministic stub with configurable latency, and
+the embedding model can optionally be replaced by a hash-based fake. Results
+are written as JSON (one file per run plus a runs.jsonl history) so numbers
+can be compared between commits.
+
+    python benchmark.py --files 20 --pages 10 --questions 50 --fake-embeddings
+"""
+import argparse
+import json
+import math
+import random
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import rag_chatbot
+from vector_index import normalize_rows
+
+WORDS = (
+    "policy standard requirement section clause annex system process control "
+    "document review audit risk quality supplier customer product service data "
+    "safety security record training management objective measure report"
+).split()
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for ChatGroq.
+
+    Rewrite requests get the latest question back unchanged; answer requests
+    get the first `answer_words` words of the prompt's system message. Each
+    call waits `first_token_latency` seconds, then `token_latency` per word.
+    """
+
+    first_token_latency: float = 0.2
+    token_latency: float = 0.01
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def _reply(self, messages):
+        system, question = messages[0].content, messages[-1].content
+        if system.startswith("Rephrase"):
+            return question.split()
+        return system.split()[:self.answer_words]
+
+    def _generate(self, messages, stop = None, run_manager = None, **kwargs):
+        words = self._reply(messages)
+        time.sleep(self.first_token_latency + self.token_latency * len(words))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(words)))])
+
+    def _stream(self, messages, stop = None, run_manager = None, **kwargs):
+        time.sleep(self.first_token_latency)
+        for i, word in enumerate(self._reply(messages)):
+            time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=(" " if i else "") + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class StageTimer(BaseCallbackHandler):
+    """Collects wall time of the rewrite, retrieval and generation stages of one chain call."""
+
+    stage_names = {
+        "rewrite_question": "rewrite",
+        "stuff_documents_chain": "generation"
+    }
+
+    def __init__(self):
+        self.started = {}
+        self.stages = {"rewrite": 0.0, "retrieval": 0.0, "generation": 0.0}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, name = None, **kwargs):
+        if name in self.stage_names:
+            self.started[run_id] = (self.stage_names[name], time.perf_counter())
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self.started[run_id] = ("retrieval", time.perf_counter())
+
+    def _end(self, run_id):
+        if run_id in self.started:
+            stage, start = self.started.pop(run_id)
+            self.stages[stage] += time.perf_counter() - start
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id)
+
+
+def write_pdf(path, pages):
+    """Write a minimal single-font PDF with one text page per entry of `pages`."""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 2 * len(pages) + 2
+    page_ids = []
+    for text in pages:
+        lines = [text[i:i + 90] for i in range(0, len(text), 90)]
+        content = b"BT /F1 10 Tf 40 800 Td 12 TL " + b" ".join(
+            b"(" + line.encode("latin-1") + b") '" for line in lines
+        ) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, len(objects))
+        )
+        page_ids.append(len(objects))
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids)
+    ))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, len(objects), xref
+    )
+    Path(path).write_bytes(bytes(out))
+
+
+def make_corpus(pdf_dir, files, pages, words_per_page, seed = 0):
+    rng = random.Random(seed)
+    Path(pdf_dir).mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        write_pdf(
+            Path(pdf_dir) / f"synthetic_{i:04d}.pdf",
+            [" ".join(rng.choice(WORDS) for _ in range(words_per_page)) for _ in range(pages)]
+        )
+
+
+def percentiles(values):
+    """Nearest-rank p50/p95/p99."""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {
+        f"p{p}": ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+        for p in (50, 95, 99)
+    }
+
+
+def peak_rss_mb():
+    usage = [resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return round(max(usage) / 1024, 1)     # ru_maxrss is in KiB on Linux
+
+
+def embedding_parity(texts, backend):
+    """Cosine similarity of `backend` embeddings against the PyTorch model's."""
+    reference = normalize_rows(rag_chatbot.load_embedding_model("torch").embed_documents(texts))
+    candidate = normalize_rows(rag_chatbot.load_embedding_model(backend).embed_documents(texts))
+    cosines = (reference * candidate).sum(axis=1)
+    return {"mean_cosine": round(float(cosines.mean()), 6), "min_cosine": round(float(cosines.min()), 6)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=rag_chatbot.base_path, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(args, work_dir):
+    rag_chatbot.vectorstore_dir = str(Path(work_dir) / "vectorstore")
+    rag_chatbot.manifest_path = str(Path(work_dir) / "ingest_manifest.json")
+    rag_chatbot.collection_use_path = str(Path(work_dir) / "collection_last_used.json")
+    rag_chatbot.embedding_cache_dir = str(Path(work_dir) / "embedding_cache")
+    rag_chatbot.numpy_index_dir = str(Path(work_dir) / "numpy_index")
+    rag_chatbot.embedding_backend = args.embedding_backend
+    embedding_factory = (
+        (lambda: DeterministicFakeEmbedding(size=384)) if args.fake_embeddings
+        else rag_chatbot.default_embedding_factory
+    )
+    rag_chatbot.components = rag_chatbot.RAGComponents(
+        lambda key: StubChatModel(first_token_latency=args.llm_latency, token_latency=args.token_latency),
+        embedding_factory
+    )
+
+    pdf_dir = Path(work_dir) / "pdfs"
+    make_corpus(pdf_dir, args.files, args.pages, args.words_per_page)
+    total_pages = args.files * args.pages
+
+    start = time.perf_counter()
+    stats = rag_chatbot.ingest_documents(str(pdf_dir), "stub", workers=args.workers)
+    ingest_seconds = time.perf_counter() - start
+    chunks = stats["added"] + stats["updated"]
+
+    start = time.perf_counter()
+    rag_chatbot.ingest_documents(str(pdf_dir), "stub", workers=args.workers)
+    reingest_seconds = time.perf_counter() - start
+
+    rng = random.Random(1)
+    rag = rag_chatbot.initialize_components("stub")
+    parity = None
+    if args.embedding_backend != "torch" and not args.fake_embeddings:
+        parity = embedding_parity(rag.vector_store.get(limit=200, include=["documents"])["documents"], args.embedding_backend)
+    latencies = {"total": [], "rewrite": [], "retrieval": [], "generation": []}
+    for i in range(args.questions):
+        topic = " ".join(rng.choice(WORDS) for _ in range(4))
+        # Every third turn is a follow-up so the rewrite stage gets exercised
+        question = f"And what about its {topic}?" if i % 3 == 2 else f"What does the {topic} say?"
+        timer = StageTimer()
+        start = time.perf_counter()
+        rag.chain.invoke(
+            {"input": question},
+            config={"configurable": {"session_id": f"bench-{i % args.sessions}"}, "callbacks": [timer]}
+        )
+        latencies["total"].append(time.perf_counter() - start)
+        for stage, seconds in timer.stages.items():
+            latencies[stage].append(seconds)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": vars(args),
+        "ingest": {
+            "pages": total_pages,
+            "chunks": chunks,
+            "seconds": round(ingest_seconds, 4),
+            "pages_per_second": round(total_pages / ingest_seconds, 2),
+            "chunks_per_second": round(chunks / ingest_seconds, 2),
+            "noop_reingest_seconds": round(reingest_seconds, 4)
+        },
+        "query": {
+            stage: {k: round(v, 4) for k, v in percentiles(values).items()}
+            for stage, values in latencies.items()
+        },
+        "embedding_parity": parity,
+        "rewrite_stats": dict(rag.rewriter.stats),
+        "context_packer": dict(rag_chatbot.context_packer.stats),
+        "warmup_seconds": {k: round(v, 4) for k, v in rag_chatbot.components.timings.items()},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG ingest and query with a stub LLM")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=5, help="Questions are spread over this many conversations")
+    parser.add_argument("--workers", type=int, default=rag_chatbot.ingest_workers)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Stub seconds per generated word")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use a hash-based fake instead of MiniLM")
+    parser.add_argument("--embedding-backend", choices=["torch", "onnx-int8"], default=rag_chatbot.embedding_backend)
+    parser.add_argument("--output-dir", default=str(rag_chatbot.base_path / "benchmarks"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        result = run_benchmark(args, work_dir)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    run_file = output_dir / f"{result['timestamp'].replace(':', '')}_{result['commit']}.json"
+    run_file.write_text(json.dumps(result, indent=2))
+    with open(output_dir / "runs.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+
+    print(json.dumps({k: result[k] for k in ("ingest", "query", "embedding_parity", "peak_rss_mb")}, indent=2))
+    print(f"Results written to {run_file}")
+
+
+if __name__ == "__main__":
+    main()
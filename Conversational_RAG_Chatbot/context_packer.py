@@ -0,0 +1,129 @@
+import math
+import threading
+from collections import deque
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for Llama-style tokenizers)."""
+    return math.ceil(len(text) / 4)
+
+
+def text_overlap(left, right, min_overlap = 20):
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    for size in range(min(len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_pair(left, right):
+    """Merge two chunks of the same page, or return None if they don't touch."""
+    a_start = left.metadata.get("start_index")
+    b_start = right.metadata.get("start_index")
+    a_text, b_text = left.page_content, right.page_content
+
+    if a_start is not None and b_start is not None:
+        if b_start < a_start:
+            return merge_pair(right, left)
+        a_end = a_start + len(a_text)
+        if b_start > a_end:
+            return None
+        merged = a_text + b_text[a_end - b_start:]
+        return Document(page_content = merged, metadata = left.metadata)
+
+    if b_text in a_text:
+        return left
+    if a_text in b_text:
+        return right
+    for first, second in ((left, right), (right, left)):
+        size = text_overlap(first.page_content, second.page_content)
+        if size:
+            return Document(
+                page_content = first.page_content + second.page_content[size:],
+                metadata = first.metadata
+            )
+    return None
+
+
+def merge_chunks(docs):
+    """
+    Merge overlapping or adjacent chunks that come from the same source and page.
+
+    Each merged document takes the rank of its best-ranked chunk and the
+    result is sorted by that rank, so relevance order is preserved.
+    """
+    groups = {}
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        pending = groups.setdefault(key, [])
+        best, merged = rank, doc
+        changed = True
+        while changed:
+            changed = False
+            for i, (other_rank, other) in enumerate(pending):
+                combined = merge_pair(other, merged)
+                if combined is not None:
+                    best, merged = min(best, other_rank), combined
+                    del pending[i]
+                    changed = True
+                    break
+        pending.append((best, merged))
+    ranked = sorted(item for group in groups.values() for item in group)
+    return [doc for _, doc in ranked]
+
+
+class ContextPacker:
+    """
+    Prepares retrieved documents for the stuff-documents prompt.
+
+    Overlapping chunks are merged first, then documents are added in
+    relevance order until `budget_tokens` (shared with the question and chat
+    history) is used up; the last document that doesn't fit is truncated.
+    Per-request token savings are kept in `recent`, totals in `stats`.
+    """
+
+    def __init__(self, budget_tokens = 3000, prompt_tokens = 120, min_doc_tokens = 50):
+        self.budget_tokens = budget_tokens
+        self.prompt_tokens = prompt_tokens
+        self.min_doc_tokens = min_doc_tokens
+        self.stats = {"requests": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0}
+        self.recent = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def pack(self, inputs):
+        docs = inputs["context"]
+        history = inputs.get("chat_history") or []
+        fixed = self.prompt_tokens + estimate_tokens(inputs["input"]) + sum(
+            estimate_tokens(message.content) for message in history
+        )
+        remaining = max(self.budget_tokens - fixed, self.min_doc_tokens)
+
+        packed = []
+        for doc in merge_chunks(docs):
+            tokens = estimate_tokens(doc.page_content)
+            if tokens <= remaining:
+                packed.append(doc)
+                remaining -= tokens
+                continue
+            if remaining >= self.min_doc_tokens:
+                packed.append(Document(
+                    page_content = doc.page_content[:remaining * 4],
+                    metadata = doc.metadata
+                ))
+            break
+
+        before = sum(estimate_tokens(doc.page_content) for doc in docs)
+        after = sum(estimate_tokens(doc.page_content) for doc in packed)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["tokens_before"] += before
+            self.stats["tokens_after"] += after
+            self.stats["tokens_saved"] += before - after
+            self.recent.append({"tokens_before": before, "tokens_after": after, "tokens_saved": before - after})
+        return packed
+
+    def as_runnable(self):
+        return RunnableLambda(self.pack, name = "pack_context")
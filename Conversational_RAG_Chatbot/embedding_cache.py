@@ -0,0 +1,199 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text):
+    """Unicode-normalize and collapse whitespace so trivially different strings share a key."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed embedding cache that wraps another LangChain embedding model.
+
+    Vectors are stored as float32 rows in a memory-mapped file. A small
+    SQLite table maps (model name, normalized text hash) keys to rows; only
+    the rows written by a call are saved, so a miss costs the same however
+    large the cache is. The cache holds at most `max_entries` vectors; when
+    it is full the least recently used row is overwritten. LRU order of hits
+    is saved with the next write. The wrapped model is only built on the
+    first cache miss, so a fully cached run never loads it, and it runs
+    outside the lock so a long ingest batch doesn't block query embedding.
+    """
+
+    def __init__(self, factory, model_name, cache_dir, max_entries = 200_000):
+        self.factory = factory
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.cache_dir = Path(cache_dir) / safe_name
+        self.index_path = self.cache_dir / "index.sqlite"
+        self.vectors_path = self.cache_dir / "vectors.f32"
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._rows = OrderedDict()      # key -> row, least recently used first
+        self._tick = 0                  # LRU clock saved with each row
+        self._touched = {}              # key -> tick of hits not yet saved
+        self._dim = None
+        self._vectors = None
+        self._db = None
+        self._load_index()
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                self._model = self.factory()
+            return self._model
+
+    def _key(self, text):
+        raw = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _connect(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, row INTEGER UNIQUE, tick INTEGER)")
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return
+        self._connect()
+        meta = dict(self._db.execute("SELECT name, value FROM meta"))
+        if meta.get("max_entries") != self.max_entries or not self.vectors_path.exists():
+            with self._db:
+                self._db.execute("DELETE FROM rows")
+                self._db.execute("DELETE FROM meta")
+            return
+        self._dim = meta["dim"]
+        for key, row, tick in self._db.execute("SELECT key, row, tick FROM rows ORDER BY tick"):
+            self._rows[key] = row
+            self._tick = tick
+        self._open_vectors("r+")
+
+    def _open_vectors(self, mode):
+        self._vectors = np.memmap(
+            self.vectors_path, dtype = np.float32, mode = mode,
+            shape = (self.max_entries, self._dim)
+        )
+
+    def _store(self, keys, vectors):
+        if self._vectors is None:
+            self._dim = len(vectors[0])
+            if self._db is None:
+                self._connect()
+            self._open_vectors("w+")
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [("model_name", self.model_name), ("dim", self._dim), ("max_entries", self.max_entries)]
+                )
+
+        written = {}
+        for key, vector in zip(keys, vectors):
+            if key in self._rows:
+                row = self._rows[key]
+                self._rows.move_to_end(key)
+            elif len(self._rows) < self.max_entries:
+                row = len(self._rows)
+                self._rows[key] = row
+            else:
+                _, row = self._rows.popitem(last=False)
+                self._rows[key] = row
+                self.evictions += 1
+            self._vectors[row] = vector
+            self._tick += 1
+            written[key] = (row, self._tick)
+            self._touched.pop(key, None)
+
+        # Vectors reach the file before the rows pointing at them
+        self._vectors.flush()
+        with self._db:
+            # REPLACE drops the evicted key that held the same row
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rows (key, row, tick) VALUES (?, ?, ?)",
+                [(key, row, tick) for key, (row, tick) in written.items()]
+            )
+            self._db.executemany(
+                "UPDATE rows SET tick = ? WHERE key = ?",
+                [(tick, key) for key, tick in self._touched.items() if key in self._rows]
+            )
+        self._touched.clear()
+
+    def _lookup(self, keys):
+        """Return cached vectors (or None) for each key, refreshing their LRU position."""
+        found = []
+        for key in keys:
+            row = self._rows.get(key)
+            if row is None:
+                found.append(None)
+            else:
+                self._rows.move_to_end(key)
+                self._tick += 1
+                self._touched[key] = self._tick
+                found.append(self._vectors[row].tolist())
+        return found
+
+    def embed_documents(self, texts):
+        with self._lock:
+            keys = [self._key(text) for text in texts]
+            vectors = self._lookup(keys)
+
+            missing = {}
+            for i, (key, vector) in enumerate(zip(keys, vectors)):
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+            self.hits += len(texts) - sum(len(v) for v in missing.values())
+            self.misses += sum(len(v) for v in missing.values())
+        if not missing:
+            return vectors
+
+        miss_keys = list(missing)
+        computed = self.model.embed_documents([texts[missing[k][0]] for k in miss_keys])
+        for key, vector in zip(miss_keys, computed):
+            for i in missing[key]:
+                vectors[i] = list(vector)
+        with self._lock:
+            self._store(miss_keys, computed)
+        return vectors
+
+    def embed_query(self, text):
+        with self._lock:
+            key = self._key(text)
+            vector = self._lookup([key])[0]
+            if vector is not None:
+                self.hits += 1
+                return vector
+            self.misses += 1
+        vector = self.model.embed_query(text)
+        with self._lock:
+            self._store([key], [vector])
+        return list(vector)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._rows),
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,96 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+
+# Words that usually point back at something earlier in the conversation
+FOLLOW_UP_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their",
+    "theirs", "he", "him", "his", "she", "her", "hers", "there", "above",
+    "previous", "former", "latter", "same", "else", "another", "further", "more"
+}
+FOLLOW_UP_OPENERS = ("and ", "also ", "so ", "but ", "what about", "how about", "why not")
+
+
+def looks_standalone(question, min_words = 5):
+    """Heuristic: long enough and free of pronouns or openers that refer back to the history."""
+    text = question.strip().lower()
+    words = re.findall(r"[a-z']+", text)
+    if len(words) < min_words or text.startswith(FOLLOW_UP_OPENERS):
+        return False
+    return not any(word in FOLLOW_UP_WORDS for word in words)
+
+
+def history_digest(history, turns):
+    """Hash of the last `turns` messages, used as part of the rewrite cache key."""
+    digest = hashlib.sha256()
+    for message in history[-turns:]:
+        digest.update(f"{message.type}\0{message.content}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class QuestionRewriter:
+    """
+    Turns the latest question into a standalone one, calling the LLM only when needed.
+
+    The rewrite is skipped when there is no chat history or the question
+    already looks standalone, and LLM rewrites are memoized in a bounded LRU
+    keyed by (digest of recent history, question). `stats` counts how often
+    each path was taken.
+    """
+
+    def __init__(self, llm, prompt, cache_size = 1024, history_turns = 4):
+        self.chain = prompt | llm | StrOutputParser()
+        self.cache_size = cache_size
+        self.history_turns = history_turns
+        self.stats = {"skipped": 0, "cached": 0, "executed": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _lookup(self, inputs):
+        """Return (key, rewritten question or None); key is None when no rewrite is needed."""
+        question = inputs["input"]
+        history = inputs.get("chat_history") or []
+        if not history or looks_standalone(question):
+            self._count("skipped")
+            return None, question
+
+        key = (history_digest(history, self.history_turns), question)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["cached"] += 1
+                return key, self._cache[key]
+        return key, None
+
+    def _store(self, key, rewritten):
+        with self._lock:
+            self.stats["executed"] += 1
+            self._cache[key] = rewritten
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rewritten
+
+    def rewrite(self, inputs, config = None):
+        key, question = self._lookup(inputs)
+        if key is None or question is not None:
+            return question
+        return self._store(key, self.chain.invoke(inputs, config))
+
+    async def arewrite(self, inputs, config = None):
+        key, question = self._lookup(inputs)
+        if key is None or question is not None:
+            return question
+        return self._store(key, await self.chain.ainvoke(inputs, config))
+
+    def as_runnable(self):
+        return RunnableLambda(self.rewrite, afunc = self.arewrite, name = "rewrite_question")
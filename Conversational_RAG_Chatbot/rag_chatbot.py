@@ -8,86 +8,598 @@ except ModuleNotFoundError:
 
 
 import streamlit as st
-from uuid import uuid4
+import hashlib
+import json
 from pathlib import Path
 import os
+import platform
+import asyncio
+import shutil
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from dotenv import load_dotenv
 
-from langchain_community.document_loaders import PyPDFDirectoryLoader
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from pypdf import PdfReader
 from langchain_groq import ChatGroq
 from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
+import chromadb
+from chromadb.api import ServerAPI
+from chromadb.api.client import Client as ChromaClient
+from chromadb.api.shared_system_client import SharedSystemClient
+from chromadb.config import Settings, System
+from chromadb.errors import NotFoundError
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.runnables import RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
+from embedding_cache import CachedEmbeddings
+from question_rewriter import QuestionRewriter
+from semantic_cache import SemanticCache
+from context_packer import ContextPacker
+from vector_index import NumpyRetriever, NumpyVectorIndex, build_index, current_version
+
 
 chunk_size = 1000
 chunk_overlap = 200
 collection_name = "QandA"
 embedding_model = "sentence-transformers/all-MiniLM-L6-v2"
+embedding_backend = "torch"         # "torch", or "onnx-int8" for dynamically quantized ONNX Runtime on CPU
 base_path = Path(__file__).parent if "__file__" in locals() else Path.cwd()
 pdf_dir = str(base_path/ "standards")
 vectorstore_dir = str(base_path/"resources/vectorstore")
+manifest_path = str(base_path/"resources/ingest_manifest.json")
+collection_use_path = str(base_path/"resources/collection_last_used.json")
+ingest_workers = 1          # >1 parses and splits PDFs in a process pool
+embed_batch_size = 64       # chunks per add_documents call
+embedding_cache_dir = str(base_path/"resources/embedding_cache")
+embedding_cache_size = 200_000
+rewrite_cache_size = 1024
+semantic_cache_enabled = False      # opt-in: answer near-duplicate questions from cache
+semantic_cache_threshold = 0.95     # minimum cosine similarity for a hit
+semantic_cache_ttl = 3600           # seconds
+semantic_cache_size = 1000
+retrieval_k = 4                     # documents retrieved per question
+retriever_backend = "chroma"        # "chroma" or "numpy" (flat memory-mapped index)
+numpy_index_dtype = "float16"       # "float16" or "int8"
+numpy_index_dir = str(base_path/"resources/numpy_index")
+context_token_budget = 3000         # prompt tokens shared by retrieved context, history and question
+max_concurrent_llm_calls = 8        # in-flight async chain invocations per process
+query_timeout = 60                  # seconds before aquery gives up
+max_open_collections = 16           # collections kept open in memory (LRU)
+max_open_collection_bytes = 512 * 1024 * 1024   # estimated memory of open collections
+collection_idle_ttl = 1800          # seconds before an unused collection is closed
+session_collection_prefix = "session-"
+session_collection_retention = 7 * 24 * 3600    # seconds before an idle session collection is deleted
+collection_gc_interval = 60         # seconds between garbage-collection passes
+embedding_dim = 384                 # all-MiniLM-L6-v2, used for memory estimates
 
 GROQ_MODEL = "llama-3.3-70b-versatile"
 
-llm = None
-vector_store = None
 session_store = {}
+session_locks = {}                  # session_id -> FairLock serializing that conversation's turns, while in use
+session_store_lock = threading.Lock()
+llm_slots = None                    # FairLock(max_concurrent_llm_calls), defined below
+semantic_cache = SemanticCache(semantic_cache_threshold, semantic_cache_ttl, semantic_cache_size)
+context_packer = ContextPacker(context_token_budget)
 
-def initialize_components(GROQ_API_KEY):
-    global llm, vector_store
 
-    if llm is None:
-        llm = ChatGroq(model = GROQ_MODEL, api_key = GROQ_API_KEY)
-    
-    if vector_store is None:
-        ef = HuggingFaceEmbeddings(
-            model_name = embedding_model,
-            model_kwargs  = {"trust_remote_code": True}
-        )
+def default_llm_factory(GROQ_API_KEY):
+    return ChatGroq(model = GROQ_MODEL, api_key = GROQ_API_KEY)
 
-        vector_store = Chroma(
-            collection_name = collection_name,
-            embedding_function = ef,
-            persist_directory = vectorstore_dir
 
-        )
+def quantized_onnx_file():
+    """Pick the int8 ONNX export of the embedding model that matches this CPU's instruction set."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+    except OSError:
+        flags = ""
+    if "avx512_vnni" in flags:
+        return "onnx/model_qint8_avx512_vnni.onnx"
+    if "avx512f" in flags:
+        return "onnx/model_qint8_avx512.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+
+def load_embedding_model(backend = None):
+    """
+    Load the HuggingFace embedding model for `backend`.
+
+    "onnx-int8" needs sentence-transformers[onnx] (optimum + onnxruntime); if
+    it can't be loaded the PyTorch model is used instead.
+    """
+    backend = backend or embedding_backend
+    if backend == "onnx-int8":
+        try:
+            return HuggingFaceEmbeddings(
+                model_name = embedding_model,
+                model_kwargs = {"backend": "onnx", "model_kwargs": {"file_name": quantized_onnx_file()}}
+            )
+        except Exception as e:
+            print(f"Warning: ONNX int8 embedding backend unavailable ({e}). Falling back to PyTorch.")
+    return HuggingFaceEmbeddings(
+        model_name = embedding_model,
+        model_kwargs  = {"trust_remote_code": True}
+    )
+
+
+def default_embedding_factory():
+    # Cache entries are keyed by backend too, so int8 vectors never mix with PyTorch ones
+    return CachedEmbeddings(
+        load_embedding_model,
+        model_name = embedding_model if embedding_backend == "torch" else f"{embedding_model}:{embedding_backend}",
+        cache_dir = embedding_cache_dir,
+        max_entries = embedding_cache_size
+    )
+
+
+chroma_registry_lock = threading.Lock()
+
+# Private Systems rely on chromadb internals: Client.from_system registers the
+# System in SharedSystemClient._identifier_to_system, which we then undo. Both
+# were checked against chromadb 1.0.x; on other versions every collection
+# shares the regular PersistentClient and closing one frees nothing.
+private_chroma_systems = (
+    chromadb.__version__.startswith("1.0.")
+    and isinstance(getattr(SharedSystemClient, "_identifier_to_system", None), dict)
+)
+if not private_chroma_systems:
+    print(f"Warning: chromadb {chromadb.__version__} is untested here; closed collections stay in Chroma's cache.")
+
+
+def open_chroma_client(path):
+    """
+    Chroma client with a System of its own, returned as (client, system).
+
+    chromadb shares one System per persist directory, and its HNSW cache
+    (sized by the open-file limit) keeps every collection ever queried in
+    memory. A private System holds only the collections used through it and
+    frees them when stopped. It is taken back out of chromadb's registry so
+    other clients of `path` never pick it up. system is None when private
+    Systems aren't supported (see `private_chroma_systems`).
+    """
+    if not private_chroma_systems:
+        return chromadb.PersistentClient(path, Settings(anonymized_telemetry = False)), None
+    system = System(Settings(is_persistent = True, persist_directory = path, anonymized_telemetry = False))
+    system.instance(ServerAPI)
+    system.start()
+    with chroma_registry_lock:
+        registry = SharedSystemClient._identifier_to_system
+        previous = registry.get(path)
+        client = ChromaClient.from_system(system)
+        if previous is None:
+            registry.pop(path, None)
+        else:
+            registry[path] = previous
+    return client, system
+
+
+class OpenCollection:
+    """
+    A collection's vector store and compiled chain, as handed out by `RAGComponents.get`.
+
+    The vector store runs on its own Chroma System, so closing the collection
+    releases its HNSW index.
+    """
+
+    def __init__(self, collection, vector_store, chain, rewriter, embeddings, system = None):
+        self.collection = collection
+        self.vector_store = vector_store
+        self.chain = chain
+        self.rewriter = rewriter
+        self.embeddings = embeddings
+        self.system = system
+        self.users = 0              # turns and ingests currently using it (see RAGComponents.acquire)
+        self.evicted = False
+        self.last_used = time.monotonic()
+        self.approx_bytes = 0
+        self.measure()
+
+    def measure(self):
+        """Re-estimate resident size from the number of stored chunks."""
+        self.approx_bytes = self.vector_store._collection.count() * (embedding_dim * 4 + chunk_size)
+        return self.approx_bytes
+
+    def close(self):
+        if self.system is not None:
+            self.system.stop()
+            self.system = None
+
+
+class RAGComponents:
+    """
+    Owns the LLM, embeddings and the open collections with their compiled chains.
+
+    The LLM and embeddings are built lazily once per process under a lock, so
+    concurrent sessions never load the embedding model twice; the LLM is
+    rebuilt only when the API key changes. Each collection gets its own
+    vector store and chain, kept in an LRU capped by `max_open_collections`
+    and `max_open_collection_bytes`. Collections idle for longer than
+    `collection_idle_ttl` are closed; everything is persisted, so a closed
+    collection is simply reopened from disk on its next use. Closing stops
+    the collection's Chroma System, which frees its index; a collection
+    evicted while a turn is using it (see `acquire`) is closed when that
+    turn releases it. Session collections not used (queried or ingested
+    into) for `session_collection_retention` seconds are deleted. Seconds
+    spent building each part the first time (the warm-up) are kept in
+    `timings`; later collections and API keys don't overwrite them.
+    """
+
+    def __init__(self, llm_factory = default_llm_factory, embedding_factory = default_embedding_factory):
+        self.llm_factory = llm_factory
+        self.embedding_factory = embedding_factory
+        self.api_key = None
+        self.llm = None
+        self.embeddings = None
+        self.rewriter = None
+        self.open_collections = OrderedDict()
+        self.evictions = 0
+        self.timings = {}
+        self._used_at = {}          # collection -> wall-clock time of last use, not yet saved
+        self._last_gc = time.monotonic()
+        self._lock = threading.RLock()
+
+    def _timed(self, name, build):
+        start = time.perf_counter()
+        value = build()
+        self.timings.setdefault(name, time.perf_counter() - start)
+        return value
+
+    def _open(self, collection):
+        client, system = open_chroma_client(vectorstore_dir)
+        vector_store = self._timed("vector_store", lambda: Chroma(
+            collection_name = collection,
+            embedding_function = self.embeddings,
+            client = client
+        ))
+        chain = self._timed("chain", lambda: setup_rag_chain(self.llm, vector_store, self.rewriter))
+        return OpenCollection(collection, vector_store, chain, self.rewriter, self.embeddings, system)
+
+    def get(self, GROQ_API_KEY, collection = None):
+        """Return the OpenCollection for this API key and collection, opening it if needed."""
+        collection = collection or collection_name
+        with self._lock:
+            if self.llm is None or self.api_key != GROQ_API_KEY:
+                self.llm = self._timed("llm", lambda: self.llm_factory(GROQ_API_KEY))
+                self.api_key = GROQ_API_KEY
+                self.rewriter = QuestionRewriter(self.llm, contextualize_prompt, rewrite_cache_size)
+                for name in list(self.open_collections):
+                    self._drop(name)            # their chains are bound to the old LLM
+
+            if self.embeddings is None:
+                self.embeddings = self._timed("embeddings", self.embedding_factory)
+
+            handle = self.open_collections.get(collection)
+            if handle is None:
+                handle = self._open(collection)
+                self.open_collections[collection] = handle
+            self.open_collections.move_to_end(collection)
+            handle.last_used = time.monotonic()
+            self._used_at[collection] = time.time()
+
+            self._evict()
+            if time.monotonic() - self._last_gc > collection_gc_interval:
+                self._last_gc = time.monotonic()
+                self.collect_garbage()
+            return handle
+
+    def acquire(self, GROQ_API_KEY, collection = None):
+        """Like `get`, but the collection stays open until `release` even if it is evicted meanwhile."""
+        with self._lock:
+            handle = self.get(GROQ_API_KEY, collection)
+            handle.users += 1
+            return handle
+
+    def release(self, handle):
+        with self._lock:
+            handle.users -= 1
+            self._used_at[handle.collection] = time.time()
+            if handle.evicted and handle.users == 0:
+                handle.close()
+
+    @contextmanager
+    def using(self, GROQ_API_KEY, collection = None):
+        handle = self.acquire(GROQ_API_KEY, collection)
+        try:
+            yield handle
+        finally:
+            self.release(handle)
+
+    @asynccontextmanager
+    async def ausing(self, GROQ_API_KEY, collection = None):
+        """
+        Async `using`: opens the collection in a worker thread.
+
+        If the caller is cancelled (e.g. times out) while the collection is
+        being opened, it is released as soon as the open finishes.
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(self.acquire, GROQ_API_KEY, collection))
+
+        def release_late(task):
+            if not task.cancelled() and task.exception() is None:
+                self.release(task.result())
+
+        try:
+            handle = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.add_done_callback(release_late)
+            raise
+        try:
+            yield handle
+        finally:
+            self.release(handle)
+
+    def _drop(self, name):
+        handle = self.open_collections.pop(name)
+        handle.evicted = True
+        self.evictions += 1
+        if handle.users == 0:
+            handle.close()
+
+    def _evict(self):
+        """Close idle collections, then least recently used ones until within the limits."""
+        now = time.monotonic()
+        for name, handle in list(self.open_collections.items())[:-1]:
+            if now - handle.last_used > collection_idle_ttl:
+                self._drop(name)
+
+        while len(self.open_collections) > 1 and (
+            len(self.open_collections) > max_open_collections
+            or sum(h.approx_bytes for h in self.open_collections.values()) > max_open_collection_bytes
+        ):
+            self._drop(next(iter(self.open_collections)))
+
+    def collect_garbage(self):
+        """
+        Delete closed session collections that haven't been used within the retention period.
+
+        Last use (open, query or ingest) is saved in `collection_use_path`.
+        Session collections found in Chroma without any record, e.g. opened
+        but never ingested into, start their retention period when first seen.
+        """
+        with self._lock, manifest_lock:
+            manifest = load_manifest()
+            last_used = load_collection_use()
+            for name, used_at in self._used_at.items():
+                last_used[name] = max(used_at, last_used.get(name, 0))
+            self._used_at.clear()
+
+            now = time.time()
+            expired = []
+            client, system = open_chroma_client(vectorstore_dir)
+            try:
+                names = set(manifest["collections"]) | {c.name for c in client.list_collections()}
+                for name in sorted(names):
+                    if not name.startswith(session_collection_prefix) or name in self.open_collections:
+                        continue
+                    seen = max(last_used.get(name, 0), manifest["collections"].get(name, {}).get("updated", 0))
+                    if not seen:
+                        last_used[name] = now
+                    elif now - seen > session_collection_retention:
+                        expired.append(name)
+
+                for name in expired:
+                    try:
+                        client.delete_collection(name)
+                    except NotFoundError:
+                        pass
+                    shutil.rmtree(numpy_index_path(name), ignore_errors=True)
+                    manifest["collections"].pop(name, None)
+                    last_used.pop(name, None)
+            finally:
+                if system is not None:
+                    system.stop()
+            if expired:
+                save_manifest(manifest)
+            save_collection_use(last_used)
+            return expired
+
+    def warmup_seconds(self):
+        return sum(self.timings.values())
+
+
+components = RAGComponents()
+manifest_lock = threading.Lock()
+
+
+def initialize_components(GROQ_API_KEY, collection = None):
+    return components.get(GROQ_API_KEY, collection)
 
 def get_session_history(session_id) -> ChatMessageHistory:
     '''Get or create a session history for a session'''
-    if session_id not in session_store:
-        session_store[session_id] = ChatMessageHistory()
-    return session_store[session_id]
-
-
-def setup_rag_chain():
-    contextualize_prompt = ChatPromptTemplate.from_messages([
-        ("system", """Rephrase the latest question to be standalone based on the chat history. 
-            If the question is already clear or history is insufficient, return it unchanged. 
-            Do not answer the question or add assumptions."""),
-        MessagesPlaceholder("chat_history"),
-        ("human","{input}")
-    ])
-
-    qa_prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a precise assistant. Answer the question using only the provided documents: {context}. 
-            For questions requesting lists, provide up to 5 items in a numbered list. 
-            For other questions, give a comprehensive answer. If documents don’t fully answer the question, say 'I don’t have enough information to fully answer. 
-            If no relevant documents are found, say 'No relevant information found.' Do not fabricate details."""),
-        MessagesPlaceholder("chat_history"),
-        ("human", "{input}")
-    ])
-
-    retriever = vector_store.as_retriever(search_kwargs={"k": 4})  # Limited to 4 documents
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_prompt
+    with session_store_lock:
+        if session_id not in session_store:
+            session_store[session_id] = ChatMessageHistory()
+        return session_store[session_id]
+
+
+class FairLock:
+    """
+    Lock handed out in request order, to threads and asyncio tasks alike.
+
+    Turns of one conversation must run in the order they were submitted,
+    which neither threading.Lock nor polling guarantees. Waiting threads
+    block on an Event, waiting tasks await a future; `release` passes the
+    lock straight to the oldest waiter. With `slots` > 1 it is a FIFO
+    semaphore held by up to that many at once.
+    """
+
+    def __init__(self, slots = 1):
+        self._mutex = threading.Lock()
+        self._free = slots
+        self._waiters = deque()
+        self.users = 0              # holders and waiters, see get_session_lock
+
+    def locked(self):
+        with self._mutex:
+            return not self._free or bool(self._waiters)
+
+    def acquire(self):
+        with self._mutex:
+            if self._free:
+                self._free -= 1
+                return True
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+        return True
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._mutex:
+            if self._free:
+                self._free -= 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._mutex:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            if waiter[1].done() and not waiter[1].cancelled():
+                self.release()      # granted just before the cancellation arrived
+            raise
+
+    def _grant(self, future):
+        if future.cancelled():
+            self.release()          # the task gave up while the lock was on its way
+        else:
+            future.set_result(True)
+
+    def release(self):
+        with self._mutex:
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._grant, future)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+llm_slots = FairLock(max_concurrent_llm_calls)
+
+
+def get_session_lock(session_id):
+    """
+    The session's lock, counted as in use until `put_session_lock`.
+
+    Locks are dropped when their last user puts them back, never while a
+    turn holds or waits for one, so every turn of a session shares a lock.
+    """
+    with session_store_lock:
+        lock = session_locks.get(session_id)
+        if lock is None:
+            lock = session_locks[session_id] = FairLock()
+        lock.users += 1
+        return lock
+
+
+def put_session_lock(session_id, lock):
+    with session_store_lock:
+        lock.users -= 1
+        if lock.users == 0 and session_locks.get(session_id) is lock:
+            del session_locks[session_id]
+
+
+@contextmanager
+def session_turn(session_id):
+    """Hold the session's lock for one turn."""
+    lock = get_session_lock(session_id)
+    try:
+        with lock:
+            yield
+    finally:
+        put_session_lock(session_id, lock)
+
+
+@asynccontextmanager
+async def asession_turn(session_id):
+    """Async `session_turn`."""
+    lock = get_session_lock(session_id)
+    try:
+        async with lock:
+            yield
+    finally:
+        put_session_lock(session_id, lock)
+
+
+contextualize_prompt = ChatPromptTemplate.from_messages([
+    ("system", """Rephrase the latest question to be standalone based on the chat history. 
+        If the question is already clear or history is insufficient, return it unchanged. 
+        Do not answer the question or add assumptions."""),
+    MessagesPlaceholder("chat_history"),
+    ("human","{input}")
+])
+
+qa_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are a precise assistant. Answer the question using only the provided documents: {context}. 
+        For questions requesting lists, provide up to 5 items in a numbered list. 
+        For other questions, give a comprehensive answer. If documents don’t fully answer the question, say 'I don’t have enough information to fully answer. 
+        If no relevant documents are found, say 'No relevant information found.' Do not fabricate details."""),
+    MessagesPlaceholder("chat_history"),
+    ("human", "{input}")
+])
+
+
+def numpy_index_path(collection):
+    return str(Path(numpy_index_dir) / collection)
+
+
+def make_retriever(vector_store):
+    """Retriever for the configured backend over the given collection."""
+    if retriever_backend == "numpy":
+        index_path = numpy_index_path(vector_store._collection.name)
+        if current_version(index_path) is None:
+            build_index(index_path, vector_store, numpy_index_dtype)
+        return NumpyRetriever(
+            index = NumpyVectorIndex(index_path),
+            embeddings = vector_store.embeddings,
+            k = retrieval_k
+        )
+    return vector_store.as_retriever(search_kwargs={"k": retrieval_k})
+
+
+def setup_rag_chain(llm, vector_store, rewriter):
+    retriever = make_retriever(vector_store)
+    history_aware_retriever = (rewriter.as_runnable() | retriever).with_config(
+        run_name="chat_retriever_chain"
+    )
+    document_chain = (
+        RunnablePassthrough.assign(context = context_packer.as_runnable())
+        | create_stuff_documents_chain(llm, qa_prompt)
     )
-    document_chain = create_stuff_documents_chain(llm, qa_prompt)
 
     rag_chain = create_retrieval_chain(history_aware_retriever, document_chain)
 
@@ -100,74 +612,476 @@ def setup_rag_chain():
     )
 
 
-def ingest_documents(pdf_dir, GROQ_API_KEY):
-    """
-    Process and store documents from URLs.
-    
-    Args:
-        urls: List of URLs to load and process
-    """
-    global vector_store
+def load_manifest():
+    """Load the ingestion manifest, or an empty one if it doesn't exist yet."""
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"collections": {}}
+
+
+def save_manifest(manifest):
+    """Atomically write the ingestion manifest next to the vector store."""
+    Path(manifest_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def load_collection_use():
+    """Collection -> wall-clock time of its last use, as saved by `RAGComponents.collect_garbage`."""
+    try:
+        with open(collection_use_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_collection_use(last_used):
+    Path(collection_use_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = collection_use_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(last_used, f, indent=2)
+    os.replace(tmp_path, collection_use_path)
+
 
-    initialize_components(GROQ_API_KEY)
-    vector_store.reset_collection()
+def file_hash(path):
+    """SHA-256 of a file's bytes, read in blocks."""
+    with open(path, "rb") as f:
+        return stream_hash(f)
 
-    loader = PyPDFDirectoryLoader(pdf_dir)
-    documents = loader.load()
 
+def stream_hash(f):
+    """SHA-256 of a binary file object's contents, read in blocks from the start."""
+    digest = hashlib.sha256()
+    f.seek(0)
+    for block in iter(lambda: f.read(1 << 20), b""):
+        digest.update(block)
+    return digest.hexdigest()
 
-    text_splitter = RecursiveCharacterTextSplitter(
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(file_key, index):
+    """Stable vector id for the index-th chunk of a file."""
+    return hashlib.sha256(f"{file_key}:{index}".encode("utf-8")).hexdigest()[:32]
+
+
+def make_text_splitter():
+    return RecursiveCharacterTextSplitter(
         separators = ["\n\n", "\n", ".", " "],
         chunk_size = chunk_size,
-        chunk_overlap = chunk_overlap
+        chunk_overlap = chunk_overlap,
+        add_start_index = True
     )
 
-    chunks = text_splitter.split_documents(documents)
 
-    uuids = [str(uuid4()) for _ in chunks]
+def load_and_split(path):
+    """Parse one PDF and split it into chunks."""
+    return make_text_splitter().split_documents(PyPDFLoader(str(path)).load())
 
-    vector_store.add_documents(
-        documents = chunks,
-        ids = uuids
-    )
 
-def query(question, GROQ_API_KEY, session_id = "default"):
+def iter_split_upload(file, progress = None):
+    """
+    Lazily parse and split an in-memory PDF one page at a time.
+
+    Only the current page's text and chunks are held in memory. Pages are
+    split independently, exactly like `load_and_split`, so chunk order and
+    ids match the directory path. `progress(name, page, total_pages)` is
+    called after each page.
+    """
+    text_splitter = make_text_splitter()
+    file.seek(0)
+    reader = PdfReader(file)
+    total_pages = len(reader.pages)
+    for number, page in enumerate(reader.pages):
+        page_doc = Document(
+            page_content = page.extract_text(),
+            metadata = {
+                "source": file.name,
+                "page": number,
+                "page_label": reader.page_labels[number],
+                "total_pages": total_pages
+            }
+        )
+        yield from text_splitter.split_documents([page_doc])
+        if progress:
+            progress(file.name, number + 1, total_pages)
+
+
+def iter_split_files(paths, workers = 1):
+    """
+    Yield (path, chunks) for each PDF, in the order of `paths`.
+
+    With more than one worker the files are parsed and split in a process
+    pool, keeping at most two files per worker in flight so memory stays
+    bounded. Output order and metadata match the serial path.
+    """
+    if workers <= 1:
+        for path in paths:
+            yield path, load_and_split(path)
+        return
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(load_and_split, path)))
+            if len(pending) >= workers * 2:
+                done_path, future = pending.popleft()
+                yield done_path, future.result()
+        while pending:
+            done_path, future = pending.popleft()
+            yield done_path, future.result()
+
+
+def ingest_documents(pdf_dir, GROQ_API_KEY, workers = None, collection = None):
+    """
+    Incrementally sync the PDFs in a directory into the vector store.
+
+    Files whose content hash matches the manifest are skipped without being
+    parsed; changed files are re-split and only chunks whose text changed are
+    re-embedded. Vectors of files (or trailing chunks) that disappeared are
+    deleted.
+
+    Args:
+        pdf_dir: Directory containing the PDF files
+        GROQ_API_KEY: Groq API key
+        workers: Number of processes used to parse PDFs (defaults to `ingest_workers`)
+        collection: Target collection (defaults to `collection_name`)
+
+    Returns:
+        Dict with counts of added, updated, skipped and deleted chunks
+    """
+    paths = {
+        path.relative_to(pdf_dir).as_posix(): path
+        for path in sorted(Path(pdf_dir).glob("[!.]*.pdf"))
+    }
+    digests = {file_key: file_hash(path) for file_key, path in paths.items()}
+
+    def split_changed(file_keys):
+        split = iter_split_files([paths[k] for k in file_keys], workers or ingest_workers)
+        for file_key, (_, docs) in zip(file_keys, split):
+            yield file_key, docs
+
+    return sync_files(digests, split_changed, GROQ_API_KEY, collection)
+
+
+def ingest_files(files, GROQ_API_KEY, progress = None, collection = None):
+    """
+    Incrementally sync uploaded PDFs (binary file objects with a `.name`) into the vector store.
+
+    Same semantics as `ingest_documents`, but nothing is written to disk:
+    each changed file is parsed page by page and its chunks are embedded in
+    batches of `embed_batch_size`, so memory stays flat regardless of upload
+    size.
+
+    Args:
+        files: File-like objects, e.g. Streamlit UploadedFile
+        GROQ_API_KEY: Groq API key
+        progress: Optional callback(file_name, pages_done, total_pages)
+        collection: Target collection (defaults to `collection_name`)
+
+    Returns:
+        Dict with counts of added, updated, skipped and deleted chunks
+    """
+    uploads = {f.name: f for f in files}
+    digests = {name: stream_hash(f) for name, f in uploads.items()}
+
+    def split_changed(file_keys):
+        for file_key in file_keys:
+            yield file_key, iter_split_upload(uploads[file_key], progress)
+
+    return sync_files(digests, split_changed, GROQ_API_KEY, collection)
+
+
+def sync_files(digests, split_changed, GROQ_API_KEY, collection = None):
+    """
+    Bring the collection in line with a set of files.
+
+    Args:
+        digests: {file_key: content hash} of every file that should be in the collection
+        split_changed: Callable taking the changed file keys and yielding
+            (file_key, chunks) in that order; chunks may be a lazy iterable
+        GROQ_API_KEY: Groq API key
+        collection: Target collection (defaults to `collection_name`)
+    """
+    with components.using(GROQ_API_KEY, collection) as rag:
+        return _sync_collection(rag, digests, split_changed)
+
+
+def _sync_collection(rag, digests, split_changed):
+    collection, vector_store = rag.collection, rag.vector_store
+
+    entry = load_manifest()["collections"].get(collection, {})
+    previous_files = entry.get("files", {})
+    if not previous_files:
+        # No record of what is in the collection, so start from a clean slate
+        vector_store.reset_collection()
+
+    stats = {"added": 0, "updated": 0, "skipped": 0, "deleted": 0}
+    current_files = {}
+    stale_ids = []
+
+    changed = []
+    for file_key, digest in digests.items():
+        previous = previous_files.get(file_key)
+        if previous and previous["hash"] == digest:
+            stats["skipped"] += len(previous["chunks"])
+            current_files[file_key] = previous
+        else:
+            changed.append(file_key)
+
+    batch_docs, batch_ids = [], []
+    for file_key, docs in split_changed(changed):
+        previous_chunks = previous_files.get(file_key, {}).get("chunks", {})
+        chunks = {}
+        for index, doc in enumerate(docs):
+            cid = chunk_id(file_key, index)
+            chunks[cid] = text_hash(doc.page_content)
+            if previous_chunks.get(cid) == chunks[cid]:
+                stats["skipped"] += 1
+                continue
+            stats["updated" if cid in previous_chunks else "added"] += 1
+            batch_docs.append(doc)
+            batch_ids.append(cid)
+            if len(batch_docs) >= embed_batch_size:
+                vector_store.add_documents(documents = batch_docs, ids = batch_ids)
+                batch_docs, batch_ids = [], []
+
+        stale_ids.extend(cid for cid in previous_chunks if cid not in chunks)
+        current_files[file_key] = {"hash": digests[file_key], "chunks": chunks}
+
+    if batch_docs:
+        vector_store.add_documents(documents = batch_docs, ids = batch_ids)
+
+    for file_key, previous in previous_files.items():
+        if file_key not in current_files:
+            stale_ids.extend(previous["chunks"])
+
+    if stale_ids:
+        vector_store.delete(ids = stale_ids)
+        stats["deleted"] = len(stale_ids)
+
+    version = entry.get("version", 0)
+    if stats["added"] or stats["updated"] or stats["deleted"] or not previous_files:
+        semantic_cache.invalidate(f"{collection}:{version}")
+        version += 1
+
+    with manifest_lock:
+        manifest = load_manifest()
+        manifest["collections"][collection] = {
+            "version": version, "updated": time.time(), "files": current_files
+        }
+        save_manifest(manifest)
+
+    if retriever_backend == "numpy" and version != entry.get("version"):
+        build_index(numpy_index_path(collection), vector_store, numpy_index_dtype)
+    rag.measure()
+    return stats
+
+
+def query(question, GROQ_API_KEY, session_id = "default", collection = None):
     """
     Get an answer to a question with sources.
     
     Args:
         question: The query to process
         session_id: Conversation session identifier
+        collection: Collection to answer from (defaults to `collection_name`)
         
     Returns:
         Tuple of (answer, list_of_source_urls)
     """
-    initialize_components(GROQ_API_KEY)
-    rag_chain = setup_rag_chain()
+    with components.using(GROQ_API_KEY, collection) as rag, session_turn(session_id):
+        cached, cache_key = cached_answer(rag, question, session_id)
+        if cached:
+            return cached
+
+        result = rag.chain.invoke(
+            {"input": question},
+            config={"configurable": {"session_id": session_id}}
+        
+        )
+
+    sources = format_sources(result["context"])
+    if cache_key:
+        semantic_cache.store(*cache_key, question, result["answer"], sources)
+    return result["answer"], sources
+
+
+async def aquery(question, GROQ_API_KEY, session_id = "default", timeout = None, collection = None):
+    """
+    Async version of `query` for serving many sessions from one process.
+
+    Turns of the same session run one at a time in submission order,
+    different sessions run in parallel, and at most `max_concurrent_llm_calls`
+    chain invocations are in flight across the process. `timeout` bounds the
+    whole turn, including opening the collection and waiting for the session
+    and an LLM slot. If the
+    call times out or is cancelled, the session history is rolled back to
+    what it was before the turn.
+
+    Args:
+        question: The query to process
+        session_id: Conversation session identifier
+        timeout: Seconds to wait for the answer (defaults to `query_timeout`)
+        collection: Collection to answer from (defaults to `collection_name`)
+
+    Returns:
+        Tuple of (answer, list_of_source_urls)
+    """
+    async with asyncio.timeout(timeout or query_timeout):
+        async with components.ausing(GROQ_API_KEY, collection) as rag, asession_turn(session_id):
+            history = get_session_history(session_id)
+            turn_start = len(history.messages)
+            try:
+                async with llm_slots:
+                    cached, cache_key = await acached_answer(rag, question, session_id)
+                    if cached:
+                        return cached
+                    result = await rag.chain.ainvoke(
+                        {"input": question},
+                        config={"configurable": {"session_id": session_id}}
+                    )
+            except BaseException:
+                del history.messages[turn_start:]
+                raise
+
+    sources = format_sources(result["context"])
+    if cache_key:
+        semantic_cache.store(*cache_key, question, result["answer"], sources)
+    return result["answer"], sources
 
-    result = rag_chain.invoke(
-        {"input": question},
-        config={"configurable": {"session_id": session_id}}
-    
-    )
 
-    sources = [doc.metadata["source"] for doc in result["context"] if "source" in doc.metadata]
+_manifest_version_cache = {}
+
+def corpus_version(collection = None):
+    """Version tag of a collection's contents, bumped by every ingest that changes it."""
+    collection = collection or collection_name
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return f"{collection}:0"
+    if _manifest_version_cache.get("mtime") != mtime:
+        versions = {
+            name: entry.get("version", 0)
+            for name, entry in load_manifest()["collections"].items()
+        }
+        _manifest_version_cache.update(mtime = mtime, versions = versions)
+    return f"{collection}:{_manifest_version_cache['versions'].get(collection, 0)}"
+
+
+def cached_answer(rag, question, session_id):
+    """
+    Look the question up in the semantic cache.
+
+    Returns ((answer, sources) or None, cache_key). On a hit the turn is added
+    to the session history. cache_key is the (embedding, corpus version) to
+    store the answer under on a miss, or None when the cache is disabled. The
+    rewrite done here is memoized, so the chain doesn't pay for it twice.
+    """
+    if not semantic_cache_enabled:
+        return None, None
+
+    history = get_session_history(session_id)
+    standalone = rag.rewriter.rewrite({"input": question, "chat_history": history.messages})
+    vector = rag.embeddings.embed_query(standalone)
+    return lookup_cached_answer(rag, history, question, vector)
+
+
+async def acached_answer(rag, question, session_id):
+    """Async version of `cached_answer`."""
+    if not semantic_cache_enabled:
+        return None, None
+
+    history = get_session_history(session_id)
+    standalone = await rag.rewriter.arewrite({"input": question, "chat_history": history.messages})
+    vector = await rag.embeddings.aembed_query(standalone)
+    return lookup_cached_answer(rag, history, question, vector)
+
+
+def lookup_cached_answer(rag, history, question, vector):
+    cache_key = (vector, corpus_version(rag.collection))
+    cached = semantic_cache.lookup(*cache_key)
+    if cached:
+        history.add_user_message(question)
+        history.add_ai_message(cached[0])
+    return cached, cache_key
+
+
+def format_sources(docs):
+    """Human-readable 'source, Page number x / n' strings for retrieved chunks."""
     sources = []
-    for i in result["context"]:
+    for i in docs:
         sources.append(f'''{i.metadata["source"]}, Page number {i.metadata["page_label"]} / {i.metadata["total_pages"]}''')
+    return sources
+
+
+def stream_query(question, GROQ_API_KEY, session_id = "default", collection = None):
+    """
+    Stream an answer to a question, delivering the sources first.
+
+    Yields (event, value) tuples:
+        ("sources", list_of_sources) once retrieval has finished,
+        ("token", text) for every piece of the answer as the LLM produces it,
+        ("done", timings) at the end, where timings holds retrieval_seconds,
+        time_to_first_token and total_seconds.
+
+    The full turn is written to the session history when the stream completes.
+    """
+    with components.using(GROQ_API_KEY, collection) as rag, session_turn(session_id):
+        yield from _stream_turn(rag, question, session_id)
+
+
+def _stream_turn(rag, question, session_id):
+    start = time.perf_counter()
+    timings = {"retrieval_seconds": None, "time_to_first_token": None}
+    cached, cache_key = cached_answer(rag, question, session_id)
+    if cached:
+        timings["retrieval_seconds"] = timings["time_to_first_token"] = time.perf_counter() - start
+        yield "sources", cached[1]
+        yield "token", cached[0]
+        timings["total_seconds"] = time.perf_counter() - start
+        yield "done", timings
+        return
+
+    answer, sources = [], []
+    for chunk in rag.chain.stream(
+        {"input": question},
+        config={"configurable": {"session_id": session_id}}
+    ):
+        if "context" in chunk:
+            timings["retrieval_seconds"] = time.perf_counter() - start
+            sources = format_sources(chunk["context"])
+            yield "sources", sources
+        if chunk.get("answer"):
+            if timings["time_to_first_token"] is None:
+                timings["time_to_first_token"] = time.perf_counter() - start
+            answer.append(chunk["answer"])
+            yield "token", chunk["answer"]
+
+    if cache_key:
+        semantic_cache.store(*cache_key, question, "".join(answer), sources)
+    timings["total_seconds"] = time.perf_counter() - start
+    yield "done", timings
 
-    return result["answer"], sources
 
 def clear_session(session_id: str):
     """Clear chat history for a specific session."""
-    if session_id in session_store:
-        del session_store[session_id]
+    with session_store_lock:
+        session_store.pop(session_id, None)
 
 
 if __name__ == "__main__":
-    ingest_documents(pdf_dir)
+    load_dotenv()
+    GROQ_API_KEY = os.environ["GROQ_API_KEY"]
+    print(ingest_documents(pdf_dir, GROQ_API_KEY))
 
-    answer , sources = query("Who is Dhaval Patel and his experience?")
+    answer , sources = query("Who is Dhaval Patel and his experience?", GROQ_API_KEY)
     print(answer)
     print("--------------------")
     print(sources)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    In-memory cache of answers keyed by the embedding of the standalone question.
+
+    A lookup returns the stored (answer, sources) of the most similar cached
+    question when its cosine similarity is at least `threshold` and it was
+    stored for the same corpus version. Entries expire after `ttl_seconds`,
+    and the oldest entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, threshold = 0.95, ttl_seconds = 3600, max_entries = 1000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._vectors = None            # (n, dim) normalized float32
+        self._entries = []              # dicts aligned with the rows of _vectors
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, keep):
+        self._entries = [e for e, k in zip(self._entries, keep) if k]
+        self._vectors = self._vectors[keep] if self._entries else None
+
+    def _expire(self, now):
+        if self._entries:
+            keep = np.array([now - e["created"] < self.ttl_seconds for e in self._entries])
+            if not keep.all():
+                self.evictions += int((~keep).sum())
+                self._drop(keep)
+
+    def lookup(self, vector, corpus_version):
+        """Return (answer, sources) for a similar question, or None."""
+        with self._lock:
+            self._expire(time.time())
+            if self._entries:
+                scores = self._vectors @ self._normalize(vector)
+                for i in np.argsort(-scores):
+                    if scores[i] < self.threshold:
+                        break
+                    entry = self._entries[i]
+                    if entry["corpus_version"] == corpus_version:
+                        self.hits += 1
+                        return entry["answer"], list(entry["sources"])
+            self.misses += 1
+            return None
+
+    def store(self, vector, corpus_version, question, answer, sources):
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if len(self._entries) >= self.max_entries:
+                keep = np.ones(len(self._entries), dtype=bool)
+                keep[:len(self._entries) - self.max_entries + 1] = False
+                self.evictions += int((~keep).sum())
+                self._drop(keep)
+
+            row = self._normalize(vector)[None, :]
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+            self._entries.append({
+                "question": question,
+                "answer": answer,
+                "sources": list(sources),
+                "corpus_version": corpus_version,
+                "created": now
+            })
+
+    def invalidate(self, corpus_version = None):
+        """Drop every entry, or only those stored for one corpus version."""
+        with self._lock:
+            if corpus_version is None:
+                keep = np.zeros(len(self._entries), dtype=bool)
+            else:
+                keep = np.array([e["corpus_version"] != corpus_version for e in self._entries], dtype=bool)
+            self.evictions += int((~keep).sum())
+            if self._entries:
+                self._drop(keep)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries)
+            }
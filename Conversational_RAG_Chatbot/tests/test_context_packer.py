@@ -0,0 +1,38 @@
+from langchain_core.documents import Document
+
+from context_packer import ContextPacker, merge_chunks
+
+
+def chunk(text, source, page, start):
+    return Document(page_content = text, metadata = {"source": source, "page": page, "start_index": start})
+
+
+def test_merges_overlapping_chunks_of_a_page():
+    left = chunk("alpha beta gamma", "x.pdf", 1, 0)
+    right = chunk("gamma delta", "x.pdf", 1, 11)
+    merged = merge_chunks([left, right])
+    assert [doc.page_content for doc in merged] == ["alpha beta gamma delta"]
+
+
+def test_keeps_relevance_order_across_groups():
+    a = chunk("A" * 40, "x.pdf", 1, 0)
+    b = chunk("B" * 40, "y.pdf", 3, 0)
+    c = chunk("C" * 40, "x.pdf", 1, 500)     # same page as A, not adjacent
+    assert [doc.page_content[0] for doc in merge_chunks([a, b, c])] == ["A", "B", "C"]
+
+
+def test_merged_document_takes_its_best_rank():
+    a = chunk("A" * 40, "y.pdf", 3, 0)
+    b = chunk("B" * 40, "x.pdf", 1, 0)
+    c = chunk("C" * 40, "x.pdf", 1, 40)      # adjacent to B, so merged with it at B's rank
+    assert [doc.page_content[0] for doc in merge_chunks([a, c, b])] == ["A", "B"]
+
+
+def test_pack_truncates_the_least_relevant_document():
+    a = chunk("A" * 400, "x.pdf", 1, 0)
+    b = chunk("B" * 400, "y.pdf", 3, 0)
+    c = chunk("C" * 400, "x.pdf", 1, 5000)
+    packer = ContextPacker(budget_tokens = 250, prompt_tokens = 0, min_doc_tokens = 20)
+    packed = packer.pack({"context": [a, b, c], "input": "", "chat_history": []})
+    assert [doc.page_content[0] for doc in packed] == ["A", "B", "C"]
+    assert [len(doc.page_content) for doc in packed] == [400, 400, 200]
@@ -0,0 +1,64 @@
+import numpy as np
+
+from vector_index import NumpyVectorIndex, build_index, current_version
+
+
+class FakeCollection:
+    def __init__(self, count):
+        self._count = count
+
+    def count(self):
+        return self._count
+
+
+class FakeStore:
+    """Just enough of a Chroma vector store for build_index."""
+
+    def __init__(self, texts, dim = 8, seed = 0):
+        self.texts = texts
+        self.vectors = np.random.default_rng(seed).normal(size=(len(texts), dim))
+        self._collection = FakeCollection(len(texts))
+
+    def get(self, limit, offset, include):
+        end = offset + limit
+        return {
+            "ids": [f"id-{i}" for i in range(offset, min(end, len(self.texts)))],
+            "embeddings": self.vectors[offset:end],
+            "documents": self.texts[offset:end],
+            "metadatas": [{"row": i} for i in range(offset, min(end, len(self.texts)))]
+        }
+
+
+def test_search_returns_the_nearest_row(tmp_path):
+    store = FakeStore([f"text {i}" for i in range(50)])
+    build_index(tmp_path / "index", store, batch_size = 16)
+    index = NumpyVectorIndex(tmp_path / "index", block_rows = 20)
+    rows, _ = index.search(store.vectors[7], k = 3)
+    assert rows[0][0] == 7
+    assert index.documents([7])[0].page_content == "text 7"
+
+
+def test_snapshot_survives_a_rebuild(tmp_path):
+    old = FakeStore([f"old {i}" for i in range(50)])
+    build_index(tmp_path / "index", old)
+    index = NumpyVectorIndex(tmp_path / "index")
+    snapshot = index.snapshot()
+    rows, _ = index.search(old.vectors[3], k = 1, snapshot = snapshot)
+
+    # rebuilt twice with fewer rows, so the old version directory is gone
+    build_index(tmp_path / "index", FakeStore(["new"], seed = 1))
+    build_index(tmp_path / "index", FakeStore(["newer"], seed = 2))
+    assert not (tmp_path / "index" / index._version).exists()
+
+    assert index.documents(rows[0], snapshot)[0].page_content == "old 3"
+    assert [doc.page_content for doc in index.documents([0])] == ["newer"]
+
+
+def test_rebuild_keeps_a_pointer_to_a_complete_version(tmp_path):
+    build_index(tmp_path / "index", FakeStore(["a", "b"]))
+    first = current_version(tmp_path / "index")
+    build_index(tmp_path / "index", FakeStore(["c"]))
+    second = current_version(tmp_path / "index")
+    assert first != second
+    assert (tmp_path / "index" / second / "info.json").exists()
+    assert sorted(p.name for p in (tmp_path / "index").iterdir()) == sorted(["CURRENT", first, second])
@@ -0,0 +1,296 @@
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def current_version(index_dir):
+    """Name of the live version directory of an index, or None if it was never built."""
+    try:
+        return (Path(index_dir) / "CURRENT").read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def build_index(index_dir, vector_store, dtype = "float16", batch_size = 1000):
+    """
+    Export a Chroma collection into a flat, memory-mapped index.
+
+    Writes a new version directory inside `index_dir` holding:
+        vectors.npy   normalized embeddings as float16, or int8 rows
+        scales.npy    per-row dequantization scale (int8 only)
+        meta.jsonl    one {"id", "page_content", "metadata"} object per row
+        offsets.npy   byte offset of each line in meta.jsonl
+        info.json     dtype, dimension and row count
+
+    and then points the CURRENT file at it with an atomic rename, so readers
+    always see either the old or the new version, never a half-swapped one.
+    The previous version is kept for readers that are still opening it; older
+    ones are removed. Rows are copied in batches, so the collection is never
+    held in memory at once.
+    """
+    if dtype not in ("float16", "int8"):
+        raise ValueError(f"Unsupported index dtype: {dtype}")
+
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    version = f"v{time.time_ns()}"
+    tmp_dir = index_dir / (version + ".tmp")
+    tmp_dir.mkdir()
+
+    total = vector_store._collection.count()
+    vectors = scales = None
+    offsets = np.zeros(total, dtype=np.int64)
+
+    with open(tmp_dir / "meta.jsonl", "wb") as meta:
+        for start in range(0, total, batch_size):
+            batch = vector_store.get(
+                limit = batch_size, offset = start,
+                include = ["embeddings", "documents", "metadatas"]
+            )
+            rows = normalize_rows(batch["embeddings"])
+            end = start + len(rows)
+
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(
+                    tmp_dir / "vectors.npy", mode="w+", dtype=dtype, shape=(total, rows.shape[1])
+                )
+                if dtype == "int8":
+                    scales = np.lib.format.open_memmap(
+                        tmp_dir / "scales.npy", mode="w+", dtype=np.float32, shape=(total,)
+                    )
+
+            if dtype == "int8":
+                row_scales = np.abs(rows).max(axis=1) / 127.0
+                row_scales[row_scales == 0] = 1.0
+                vectors[start:end] = np.round(rows / row_scales[:, None]).astype(np.int8)
+                scales[start:end] = row_scales
+            else:
+                vectors[start:end] = rows.astype(np.float16)
+
+            for i, (doc_id, text, metadata) in enumerate(zip(batch["ids"], batch["documents"], batch["metadatas"])):
+                offsets[start + i] = meta.tell()
+                line = json.dumps({"id": doc_id, "page_content": text, "metadata": metadata or {}})
+                meta.write(line.encode("utf-8") + b"\n")
+
+    for array in (vectors, scales):
+        if array is not None:
+            array.flush()
+    np.save(tmp_dir / "offsets.npy", offsets)
+    with open(tmp_dir / "info.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "dtype": dtype,
+            "dim": int(vectors.shape[1]) if vectors is not None else 0,
+            "count": total
+        }, f)
+    del vectors, scales
+
+    previous = current_version(index_dir)
+    os.replace(tmp_dir, index_dir / version)
+    pointer = index_dir / "CURRENT.tmp"
+    pointer.write_text(version, encoding="utf-8")
+    os.replace(pointer, index_dir / "CURRENT")
+
+    for path in index_dir.iterdir():
+        if path.name not in (version, previous, "CURRENT"):
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+
+class IndexSnapshot:
+    """
+    One version of an index, opened as a whole.
+
+    The arrays and metadata are memory-mapped when the snapshot is opened, so
+    a search and the document lookup of its rows use the same version even if
+    the index is rebuilt (and the old files unlinked) in between.
+    """
+
+    def __init__(self, version_dir):
+        with open(version_dir / "info.json", "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info["count"]:
+            self.vectors = np.load(version_dir / "vectors.npy", mmap_mode="r")
+            self.scales = np.load(version_dir / "scales.npy", mmap_mode="r") if info["dtype"] == "int8" else None
+            with open(version_dir / "meta.jsonl", "rb") as meta:
+                self.meta = mmap.mmap(meta.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.vectors, self.scales, self.meta = np.zeros((0, 0), dtype=np.float16), None, b""
+        self.offsets = np.load(version_dir / "offsets.npy", mmap_mode="r")
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def document(self, row):
+        start = int(self.offsets[row])
+        end = self.meta.find(b"\n", start)
+        record = json.loads(self.meta[start:end if end >= 0 else len(self.meta)])
+        return Document(
+            id = record["id"],
+            page_content = record["page_content"],
+            metadata = record["metadata"]
+        )
+
+
+class NumpyVectorIndex:
+    """
+    Flat inner-product index over a directory written by `build_index`.
+
+    Arrays are opened with mmap_mode="r" on first use, so only the pages a
+    search touches are read from disk. A new snapshot is opened when the
+    index is rebuilt; callers that search and then load documents should
+    take one `snapshot()` and pass it to both.
+    """
+
+    def __init__(self, index_dir, block_rows = 65536):
+        self.index_dir = Path(index_dir)
+        self.block_rows = block_rows
+        self._lock = threading.Lock()
+        self._version = None
+        self._snapshot = None
+
+    def snapshot(self):
+        """The live version of the index, reopened if it was rebuilt since the last call."""
+        while True:
+            version = current_version(self.index_dir)
+            if version is None:
+                raise FileNotFoundError(f"No index in {self.index_dir}")
+            with self._lock:
+                if version == self._version:
+                    return self._snapshot
+                try:
+                    snapshot = IndexSnapshot(self.index_dir / version)
+                except FileNotFoundError:
+                    # removed by two quick rebuilds after we read CURRENT; read it again
+                    continue
+                self._version, self._snapshot = version, snapshot
+                return snapshot
+
+    def __len__(self):
+        return len(self.snapshot())
+
+    def search(self, queries, k = 4, snapshot = None):
+        """
+        Top-k rows by cosine similarity for one or more query vectors.
+
+        Args:
+            queries: Array of shape (dim,) or (n_queries, dim)
+            k: Number of results per query
+            snapshot: Index version to search (defaults to the live one)
+
+        Returns:
+            (rows, scores), each of shape (n_queries, k'), best first, where k' = min(k, len(index))
+        """
+        if snapshot is None:
+            snapshot = self.snapshot()
+        vectors, scales = snapshot.vectors, snapshot.scales
+        queries = normalize_rows(np.atleast_2d(queries))
+        k = min(k, len(vectors))
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, len(vectors), self.block_rows):
+            block = np.asarray(vectors[start:start + self.block_rows], dtype=np.float32)
+            scores = queries @ block.T
+            if scales is not None:
+                scores *= np.asarray(scales[start:start + len(block)])
+
+            rows = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def documents(self, rows, snapshot = None):
+        """Load the Documents for the given row numbers from the metadata sidecar of `snapshot`."""
+        if snapshot is None:
+            snapshot = self.snapshot()
+        return [snapshot.document(row) for row in rows]
+
+
+class NumpyRetriever(BaseRetriever):
+    """LangChain retriever backed by a NumpyVectorIndex."""
+
+    index: NumpyVectorIndex
+    embeddings: object
+    k: int = 4
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.retrieve_batch([query])[0]
+
+    def retrieve_batch(self, queries):
+        """Retrieve the top-k documents for several queries with a single matrix product."""
+        snapshot = self.index.snapshot()
+        if not len(snapshot):
+            return [[] for _ in queries]
+        rows, _ = self.index.search(self.embeddings.embed_documents(list(queries)), self.k, snapshot)
+        return [self.index.documents(r, snapshot) for r in rows]
+
+
+def compare_recall(vector_store, retriever, queries, k = 4):
+    """
+    Recall@k of the NumPy retriever against Chroma's own results.
+
+    Returns the mean fraction of Chroma's top-k ids that the NumPy index also
+    returns, along with per-query values.
+    """
+    retriever.k = k
+    numpy_docs = retriever.retrieve_batch(queries)
+    per_query = []
+    for query, docs in zip(queries, numpy_docs):
+        expected = {doc.id for doc in vector_store.similarity_search(query, k=k)}
+        found = {doc.id for doc in docs}
+        per_query.append(len(expected & found) / len(expected) if expected else 1.0)
+    return {
+        "recall": float(np.mean(per_query)) if per_query else 0.0,
+        "per_query": per_query
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import rag_chatbot
+
+    parser = argparse.ArgumentParser(description="Build the NumPy index and compare its recall with Chroma")
+    parser.add_argument("--dtype", choices=["float16", "int8"], default=rag_chatbot.numpy_index_dtype)
+    parser.add_argument("--queries", help="Text file with one query per line (defaults to a sample of stored chunks)")
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rag = rag_chatbot.initialize_components(os.environ.get("GROQ_API_KEY", ""))
+    index_dir = rag_chatbot.numpy_index_path(rag.collection)
+    build_index(index_dir, rag.vector_store, args.dtype)
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = [text[:200] for text in rag.vector_store.get(limit=100, include=["documents"])["documents"]]
+
+    retriever = NumpyRetriever(index=NumpyVectorIndex(index_dir), embeddings=rag.embeddings, k=args.k)
+    result = compare_recall(rag.vector_store, retriever, queries, args.k)
+    print(f"recall@{args.k} vs Chroma ({args.dtype}): {result['recall']:.4f} over {len(queries)} queries")
@@ -0,0 +1,294 @@
+import platform
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+from semantic_router.encoders import DenseEncoder
+
+model_name = "sentence-transformers/all-MiniLM-L6-v2"
+embedding_backend = "torch"  # or "onnx-int8": the model's int8 ONNX export, run by ONNX Runtime
+max_batch_size = 64         # texts encoded per model call
+max_batch_wait = 0.005      # seconds the first caller waits for others to join its batch
+memo_size = 256             # recent texts whose vectors are kept for reuse within a turn
+
+
+# x86 int8 exports in the model repo, most specific first, with the CPU flag each needs
+onnx_int8_exports = [
+    ("avx512_vnni", "onnx/model_qint8_avx512_vnni.onnx"),
+    ("avx512f", "onnx/model_qint8_avx512.onnx"),
+]
+
+
+def cpu_flags():
+    """Instruction-set flags listed in /proc/cpuinfo; empty on systems without it."""
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def onnx_int8_file():
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    flags = cpu_flags()
+    for flag, file_name in onnx_int8_exports:
+        if flag in flags:
+            return file_name
+    return "onnx/model_quint8_avx2.onnx"
+
+
+def load_model(backend = None):
+    """
+    Load the SentenceTransformer for `backend`.
+
+    Loading the ONNX export requires the onnx extra of sentence-transformers;
+    without it, a warning is printed and the PyTorch model is returned.
+    """
+    from sentence_transformers import SentenceTransformer
+    backend = backend or embedding_backend
+    if backend == "onnx-int8":
+        try:
+            return SentenceTransformer(
+                model_name, backend = "onnx", model_kwargs = {"file_name": onnx_int8_file()}
+            )
+        except Exception as e:
+            print(f"Warning: ONNX int8 embedding backend unavailable ({e}). Falling back to PyTorch.")
+    return SentenceTransformer(model_name)
+
+
+def default_model_factory():
+    return load_model()
+
+
+class EmbeddingService:
+    """
+    One embedding model shared by every component of the process.
+
+    Concurrent callers are micro-batched: the first caller waits
+    `max_batch_wait` seconds, then encodes everything queued in the meantime
+    in one model call and hands each caller its rows. Vectors of recently
+    embedded texts are memoized, so the query vector computed by the router
+    is reused by FAQ retrieval in the same turn.
+    """
+
+    def __init__(self, model_factory = default_model_factory, max_batch_size = max_batch_size,
+                 max_batch_wait = max_batch_wait, memo_size = memo_size):
+        self.model_factory = model_factory
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+        self.memo_size = memo_size
+        self.stats = {"memo_hits": 0, "encoded": 0, "batches": 0, "max_batch": 0}
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._memo = OrderedDict()
+        self._pending = []
+        self._running = False
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                self._model = self.model_factory()
+            return self._model
+
+    def _run_batches(self):
+        time.sleep(self.max_batch_wait)
+        while True:
+            with self._lock:
+                batch, size = [], 0
+                while self._pending and (not batch or size + len(self._pending[0]["texts"]) <= self.max_batch_size):
+                    request = self._pending.pop(0)
+                    batch.append(request)
+                    size += len(request["texts"])
+                if not batch:
+                    self._running = False
+                    return
+
+            texts = list(dict.fromkeys(text for request in batch for text in request["texts"]))
+            try:
+                vectors = np.asarray(
+                    self.model.encode(texts, batch_size=self.max_batch_size, normalize_embeddings=True),
+                    dtype=np.float32
+                )
+            except Exception as e:
+                for request in batch:
+                    request["error"] = e
+                    request["done"].set()
+                continue
+
+            rows = dict(zip(texts, vectors))
+            with self._lock:
+                self.stats["batches"] += 1
+                self.stats["encoded"] += len(texts)
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(texts))
+                for text, vector in rows.items():
+                    self._memo[text] = vector
+                    self._memo.move_to_end(text)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+
+            for request in batch:
+                request["vectors"] = [rows[text] for text in request["texts"]]
+                request["done"].set()
+
+    def embed(self, texts):
+        """
+        Embed a list of texts.
+
+        Args:
+            texts: Strings to embed
+
+        Returns:
+            float32 array of shape (len(texts), dim) with normalized rows
+        """
+        texts = list(texts)
+        vectors = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                if text in self._memo:
+                    self._memo.move_to_end(text)
+                    vectors[i] = self._memo[text]
+                    self.stats["memo_hits"] += 1
+                else:
+                    missing.setdefault(text, []).append(i)
+
+            if missing:
+                request = {"texts": list(missing), "done": threading.Event(), "vectors": None, "error": None}
+                self._pending.append(request)
+                leader = not self._running
+                self._running = True
+
+        if missing:
+            if leader:
+                self._run_batches()
+            request["done"].wait()
+            if request["error"] is not None:
+                raise request["error"]
+            for text, vector in zip(request["texts"], request["vectors"]):
+                for i in missing[text]:
+                    vectors[i] = vector
+
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    def embed_one(self, text):
+        return self.embed([text])[0]
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """Process-wide EmbeddingService, created on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
+
+
+class RouterEncoder(DenseEncoder):
+    """semantic_router encoder backed by the shared EmbeddingService."""
+
+    name: str = model_name
+    type: str = "huggingface"
+    score_threshold: float = 0.5
+
+    def __call__(self, docs):
+        return get_service().embed(docs).tolist()
+
+    async def acall(self, docs):
+        return self(docs)
+
+
+class ChromaEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function backed by the shared EmbeddingService."""
+
+    def __init__(self, model_name = model_name):
+        self.model_name = model_name
+
+    def __call__(self, input):
+        return list(get_service().embed(input))
+
+    @staticmethod
+    def name():
+        return "shared_sentence_transformer"
+
+    def get_config(self):
+        return {"model_name": self.model_name}
+
+    @staticmethod
+    def build_from_config(config):
+        return ChromaEmbeddingFunction(config.get("model_name", model_name))
+
+
+class LangChainEmbeddings:
+    """LangChain-compatible embeddings (embed_documents / embed_query) backed by the shared EmbeddingService."""
+
+    def embed_documents(self, texts):
+        return get_service().embed(texts).tolist()
+
+    def embed_query(self, text):
+        return get_service().embed_one(text).tolist()
+
+
+def parity_check(texts, backend = "onnx-int8"):
+    """
+    Cosine similarity between `backend` vectors and the PyTorch reference.
+
+    Returns:
+        dict with mean/min cosine and the largest drift (1 - cosine)
+    """
+    reference = load_model("torch").encode(texts, normalize_embeddings=True)
+    candidate = load_model(backend).encode(texts, normalize_embeddings=True)
+    cosines = np.sum(np.asarray(reference) * np.asarray(candidate), axis=1)
+    return {
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "max_drift": float(1 - cosines.min())
+    }
+
+
+def throughput(model, texts, batch_sizes = (1, 8, 32, 128), repeats = 3):
+    """Texts per second of `model.encode` at each batch size (best of `repeats`)."""
+    model.encode(texts[:8])     # warm up
+    results = {}
+    for batch_size in batch_sizes:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+            best = min(best, time.perf_counter() - start)
+        results[batch_size] = round(len(texts) / best, 1)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Compare embedding backends: cosine parity and throughput")
+    parser.add_argument("--backend", choices=["torch", "onnx-int8"], default="onnx-int8")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--texts", type=int, default=512, help="Number of texts to encode per run")
+    args = parser.parse_args()
+
+    faq = pd.read_csv(Path(__file__).parent / "resources/faq_data.csv")
+    sample = (faq["question"].to_list() + faq["answer"].to_list())
+    texts = (sample * (args.texts // len(sample) + 1))[:args.texts]
+
+    print(f"parity vs torch ({args.backend}): {parity_check(sample, args.backend)}")
+    for backend in dict.fromkeys(["torch", args.backend]):
+        print(f"{backend} texts/s by batch size: {throughput(load_model(backend), texts, args.batch_sizes)}")
@@ -8,10 +8,11 @@ except ModuleNotFoundError:
 
 
 from pathlib import Path
+import hashlib
 import pandas as pd
 import chromadb
-from chromadb.utils import embedding_functions
-from groq import Groq
+from llm_client import chat_completion
+from embedding_service import ChromaEmbeddingFunction
 import os
 
 
@@ -19,14 +20,16 @@ import os
 
 parent_path = Path(__file__).parent if ("__file__") in locals() else Path.cwd()
 faq_path = str(parent_path/ "resources/faq_data.csv")
-ch_client = chromadb.Client()
+faq_db_path = str(parent_path/ "resources/faq_vectorstore")
+ch_client = chromadb.PersistentClient(path = faq_db_path)
 collection_name = "faq"
+faq_direct_threshold = 0.9   # cosine similarity above which the stored answer is returned without the LLM
 
-ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name = "all-MiniLM-L6-v2"
-)
+ef = ChromaEmbeddingFunction()
 
 chat_sessions = {}
+faq_stats = {"fast_path": 0, "llm": 0}
+synced_csv = {}      # faq_path -> mtime of the CSV last synced by this process
 
 def add_chat_history(session_id, role, content):
     if session_id not in chat_sessions:
@@ -44,49 +47,99 @@ def clear_chat_history(session_id):
     if session_id in chat_sessions:
         chat_sessions[session_id] = []
 
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
 def ingest_faq_data(faq_path):
-    if collection_name not in [col.name for col in ch_client.list_collections()]:
-        collection = ch_client.get_or_create_collection(
+    """
+    Sync the FAQ CSV into the persistent Chroma collection.
+
+    Each row is stored under a hash of its question and answer, so only new
+    or edited rows are embedded and rows no longer in the CSV are deleted. A
+    CSV that hasn't changed since the last sync in this process is skipped.
+
+    Returns:
+        dict with added/deleted/unchanged row counts, or None if skipped
+    """
+    mtime = os.path.getmtime(faq_path)
+    if synced_csv.get(faq_path) == mtime:
+        return None
+
+    collection = ch_client.get_or_create_collection(
         name = collection_name,
         embedding_function=ef
-        )
+    )
 
-        df = pd.read_csv(faq_path)
+    df = pd.read_csv(faq_path).drop_duplicates()
+    rows = {
+        "faq_" + hashlib.sha256(f"{question}\0{answer}".encode("utf-8")).hexdigest()[:16]: (question, answer)
+        for question, answer in zip(df["question"].to_list(), df["answer"].to_list())
+    }
 
-        docs = df["question"].to_list()
-        metadatas = [{"answer": i} for i in df["answer"].to_list()]
+    stored = set(collection.get(include=[])["ids"])
+    added = [i for i in rows if i not in stored]
+    deleted = [i for i in stored if i not in rows]
 
+    if added:
         collection.add(
-            documents = docs,
-            metadatas = metadatas,
-            ids = [f"id_{i+1}" for i in range(len(docs))]
+            documents = [rows[i][0] for i in added],
+            metadatas = [{"answer": rows[i][1]} for i in added],
+            ids = added
         )
-        print(f"FAQ Data successfully ingested into Chroma database. collection name: {collection_name}")
-    else:
-        print(f"Collection {collection_name} is already exist")
-
-def get_relevant_answer(query):
-    collection = ch_client.get_collection(name=collection_name)
+    if deleted:
+        collection.delete(ids = deleted)
+
+    synced_csv[faq_path] = mtime
+    stats = {"added": len(added), "deleted": len(deleted), "unchanged": len(rows) - len(added)}
+    print(f"FAQ data synced into Chroma collection {collection_name}: {stats}")
+    return stats
+
+def get_relevant_matches(query, n_results = 2):
+    """
+    Closest FAQ rows to the query, best first.
+
+    Returns:
+        list of {"question", "answer", "similarity"}; embeddings are normalized and the
+        collection uses squared L2 distance, so cosine similarity = 1 - distance / 2
+    """
+    collection = ch_client.get_collection(name=collection_name, embedding_function=ef)
     result = collection.query(
         query_texts = [query],
-        n_results = 2
+        n_results = n_results
     )
-    final_answer = " ".join([i.get("answer") for i in result["metadatas"][0]])
+    return [
+        {"question": question, "answer": metadata.get("answer"), "similarity": 1 - distance / 2}
+        for question, metadata, distance in zip(result["documents"][0], result["metadatas"][0], result["distances"][0])
+    ]
+
+def get_relevant_answer(query):
+    final_answer = " ".join([match["answer"] for match in get_relevant_matches(query)])
     return final_answer
 
 # MODIFIED: Accept API key and model as parameters
 def generate_answer_with_history(messages, groq_api_key, groq_model):
-    result = Groq(api_key = groq_api_key).chat.completions.create(
-    model= groq_model,
-messages=messages,          
-    temperature=0.1,
-    max_tokens=500
+    return chat_completion(
+        groq_api_key,
+        groq_model,
+        messages,
+        temperature=0.1,
+        max_tokens=500
     )
-    return result.choices[0].message.content
 
 # MODIFIED: Accept API key and model as parameters
 def faq_chain_with_history(query, groq_api_key, groq_model, session_id = "default"):
-    context = get_relevant_answer(query)
+    matches = get_relevant_matches(query)
+
+    # Near-duplicate of a stored question: answer directly, no LLM call
+    if matches and matches[0]["similarity"] >= faq_direct_threshold:
+        answer = matches[0]["answer"]
+        faq_stats["fast_path"] += 1
+        add_chat_history(session_id, "user", query)
+        add_chat_history(session_id, "assistant", answer)
+        return answer
+
+    faq_stats["llm"] += 1
+    context = " ".join([match["answer"] for match in matches])
 
     history = get_chat_history(session_id)
 
@@ -0,0 +1,156 @@
+import os
+import random
+import re
+import threading
+import time
+
+import groq
+import httpx
+from groq import Groq
+
+groq_base_url = os.environ.get("GROQ_BASE_URL")   # None = api.groq.com; point at a local stand-in for testing
+connect_timeout = 5.0           # seconds
+request_timeout = 60.0          # seconds for the whole response
+max_connections = 20
+max_keepalive_connections = 10
+keepalive_expiry = 60.0         # seconds an idle connection is kept open
+max_retries = 3                 # retries after the first attempt, on 429, 5xx, timeouts and connection errors
+backoff_base = 0.5              # seconds; full jitter over base * 2^attempt
+backoff_max = 8.0
+max_concurrent_requests = 8
+
+
+def parse_duration(value):
+    """Seconds in a rate-limit header value such as "7.66s", "2m59.56s", "120ms" or "3"."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    return sum(float(number) * units[unit] for number, unit in parts) if parts else None
+
+
+class RateLimiter:
+    """
+    Caps in-flight requests and holds new ones back while the API says the quota is spent.
+
+    `update` reads Groq's x-ratelimit-remaining-* / x-ratelimit-reset-*
+    headers after each response; when either remaining count hits zero, or a
+    429 arrives with retry-after, requests wait until the reset time.
+    """
+
+    def __init__(self, max_concurrent = max_concurrent_requests):
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def _wait(self):
+        """Seconds until requests may resume, 0 if they may go now."""
+        with self._lock:
+            return max(0.0, self._resume_at - time.monotonic())
+
+    def __enter__(self):
+        while True:
+            # sleep out a pause before taking a slot, so waiting requests don't hold them
+            wait = self._wait()
+            if wait:
+                time.sleep(wait)
+            self._slots.acquire()
+            if not self._wait():
+                return self
+            self._slots.release()      # paused again while we waited for the slot
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+    def pause(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def update(self, headers):
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining is not None and reset and float(remaining) <= 0:
+                self.pause(reset)
+
+
+http_client = httpx.Client(
+    timeout = httpx.Timeout(request_timeout, connect=connect_timeout),
+    limits = httpx.Limits(
+        max_connections = max_connections,
+        max_keepalive_connections = max_keepalive_connections,
+        keepalive_expiry = keepalive_expiry
+    )
+)
+limiter = RateLimiter()
+stats = {"requests": 0, "retries": 0, "rate_limited": 0, "errors": 0}
+_stats_lock = threading.Lock()
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key):
+    """Groq client for `api_key`, sharing one pooled keep-alive HTTP connection pool."""
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = Groq(
+                api_key = api_key,
+                base_url = groq_base_url,
+                http_client = http_client,
+                max_retries = 0      # retries are handled below, with jitter and the shared limiter
+            )
+        return _clients[api_key]
+
+
+def count(kind):
+    with _stats_lock:
+        stats[kind] += 1
+
+
+def backoff(attempt):
+    return random.uniform(0, min(backoff_max, backoff_base * 2 ** attempt))
+
+
+def chat_completion(api_key, model, messages, **params):
+    """
+    Run a chat completion and return the message text.
+
+    Args:
+        api_key: Groq API key
+        model: Model name
+        messages: OpenAI-style list of {"role", "content"} dicts
+        **params: Extra completion parameters (temperature, max_tokens, ...)
+
+    Returns:
+        Content of the first choice
+    """
+    client = get_client(api_key)
+    for attempt in range(max_retries + 1):
+        with limiter:
+            count("requests")
+            try:
+                raw = client.chat.completions.with_raw_response.create(
+                    model = model, messages = messages, **params
+                )
+                limiter.update(raw.headers)
+                return raw.parse().choices[0].message.content
+            except groq.APIStatusError as e:
+                retryable = e.status_code == 429 or e.status_code >= 500
+                if not retryable or attempt == max_retries:
+                    count("errors")
+                    raise
+                delay = parse_duration(e.response.headers.get("retry-after")) or backoff(attempt)
+                if e.status_code == 429:
+                    count("rate_limited")
+                    limiter.pause(delay)
+            except groq.APIConnectionError:          # includes timeouts
+                if attempt == max_retries:
+                    count("errors")
+                    raise
+                delay = backoff(attempt)
+        count("retries")
+        time.sleep(delay)
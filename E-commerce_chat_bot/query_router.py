@@ -1,10 +1,7 @@
 from semantic_router import Route
-from semantic_router.routers import SemanticRouter
-from semantic_router.encoders import HuggingFaceEncoder
+from vector_router import VectorRouter
 
 
-encoder = HuggingFaceEncoder(name = "sentence-transformers/all-MiniLM-L6-v2")
-
 faq_data = Route(
     name = "faq",
     utterances=[
@@ -52,7 +49,7 @@ small_talk = Route(
 
 
 routes = [faq_data, sql, small_talk]
-router = SemanticRouter(encoder=encoder, routes=routes, auto_sync="local")
+router = VectorRouter(routes)
 
 
 
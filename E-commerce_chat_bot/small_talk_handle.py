@@ -1,4 +1,4 @@
-from groq import Groq
+from llm_client import chat_completion
 from faq_handling import get_chat_history, add_chat_history
 import os
 import streamlit as st
@@ -53,13 +53,12 @@ Always be positive, professional, and user-focused. Your goal is to be an effici
     })
     
     # Generate response
-    result = Groq(api_key = GROQ_API_KEY).chat.completions.create(
-        model=GROQ_MODEL,
-        messages=messages,
+    answer = chat_completion(
+        GROQ_API_KEY,
+        GROQ_MODEL,
+        messages,
         temperature=0.7
     )
-    
-    answer = result.choices[0].message.content
 
     # Update history
     add_chat_history(session_id, "user", query)
@@ -0,0 +1,358 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+pool_size = 4
+query_timeout = 2.0             # seconds before a running query is interrupted
+max_result_rows = 50            # hard cap on rows returned, whatever the query's own LIMIT
+mmap_size = 64 * 1024 * 1024
+immutable = False               # True skips all locking, but the database must then never change while open
+result_cache_size = 1000        # distinct (SQL, params) results kept by ResultCache
+
+use_fts = True                  # answer title/brand LIKE predicates from the products_fts trigram index
+fts_max_share = 0.01            # patterns matching more of the catalog than this keep the plain LIKE scan,
+                                # which a LIMIT stops early, instead of collecting every match from FTS
+
+# Columns the generated queries filter and sort on
+indexed_columns = {
+    "idx_products_brand": "brand COLLATE NOCASE",
+    "idx_products_price": "price",
+    "idx_products_discount": "discount",
+    "idx_products_avg_rating": "avg_rating"
+}
+
+# External-content FTS5 table over products(title, brand), kept in sync by triggers.
+# The trigram tokenizer lets FTS5 serve LIKE '%...%' patterns of 3+ characters from the index.
+fts_schema = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title, brand, content = 'products', content_rowid = 'rowid', tokenize = 'trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, title, brand) VALUES (new.rowid, new.title, new.brand);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, title, brand) VALUES ('delete', old.rowid, old.title, old.brand);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, title, brand) VALUES ('delete', old.rowid, old.title, old.brand);
+        INSERT INTO products_fts (rowid, title, brand) VALUES (new.rowid, new.title, new.brand);
+    END""",
+    # Per-column document counts of each trigram, used to estimate how selective a pattern is
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts_vocab USING fts5vocab(products_fts, 'col')"
+]
+
+def trigrams(pattern):
+    """Trigrams FTS5 looks up for a LIKE pattern (empty when no literal run has 3+ characters)."""
+    runs = re.split(r"[%_]", pattern.lower())
+    return {run[i:i + 3] for run in runs for i in range(len(run) - 2)}
+
+
+text_like = re.compile(
+    r"\b((?:\w+\.)?)(title|brand)\s+LIKE\s+('(?:[^']|'')*'|\?)(\s+ESCAPE\s+(?:'(?:[^']|'')*'|\?))?",
+    re.IGNORECASE
+)
+string_literal = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+
+class QueryRejected(Exception):
+    """The query isn't a single SELECT, or its plan is too expensive to run."""
+
+
+def ensure_indexes(db_path):
+    """Create the product indexes and the FTS table if they don't exist yet (needs write access once)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+            missing = {name: column for name, column in indexed_columns.items() if name not in existing}
+            for name, column in missing.items():
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON products ({column})")
+            if use_fts and "products_fts_vocab" not in existing:
+                for statement in fts_schema:
+                    conn.execute(statement)
+                conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+            if missing:
+                conn.execute("ANALYZE")
+    except sqlite3.OperationalError as e:
+        print(f"Warning: could not create product indexes ({e}). Queries will run without them.")
+    finally:
+        conn.close()
+
+
+class ReadOnlyPool:
+    """
+    Fixed pool of read-only SQLite connections shared by all sessions.
+
+    Connections are opened with mode=ro (or immutable=1) and memory-mapped
+    I/O. Every query is checked with EXPLAIN QUERY PLAN, interrupted after
+    `query_timeout` seconds and capped at `max_result_rows` rows.
+    """
+
+    def __init__(self, db_path, size = pool_size, timeout = query_timeout, max_rows = max_result_rows):
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.stats = {"queries": 0, "rejected": 0, "timeouts": 0}
+        self._stats_lock = threading.Lock()
+        self._pool = queue.Queue()
+        for _ in range(size):
+            self._pool.put(self._connect())
+        with self.connection() as conn:
+            self.fts = use_fts and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'products_fts_vocab'"
+            ).fetchone() is not None
+
+    def _connect(self):
+        mode = "immutable=1" if immutable else "mode=ro"
+        conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?{mode}", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {mmap_size}")
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            conn.set_progress_handler(None, 0)
+            self._pool.put(conn)
+
+    def estimate_matches(self, conn, column, pattern):
+        """Upper bound on rows matching `column LIKE pattern`: the row count of its rarest trigram, or None."""
+        grams = trigrams(pattern)
+        if not grams:
+            return None
+        counts = dict(conn.execute(
+            f"SELECT term, doc FROM products_fts_vocab WHERE col = ? AND term IN ({', '.join('?' * len(grams))})",
+            (column, *grams)
+        ))
+        return min(counts.get(gram, 0) for gram in grams)
+
+    def rewrite(self, conn, sql, params = (), max_share = None):
+        """
+        Serve selective `title`/`brand` LIKE predicates from products_fts instead of scanning products.
+
+        A predicate is rewritten when its estimated matches are at most
+        `max_share` (default `fts_max_share`) of the catalog. Predicates with
+        an ESCAPE clause are left alone: FTS5 can't use its index for them.
+        """
+        if not self.fts:
+            return sql
+        max_share = fts_max_share if max_share is None else max_share
+        total = conn.execute("SELECT max(rowid) FROM products").fetchone()[0] or 0
+
+        def replace(match):
+            qualifier, column, value, escape = match.groups()
+            if escape:
+                return match.group(0)
+            if value == "?":
+                index = string_literal.sub("", sql[:match.start()]).count("?")
+                pattern = params[index] if index < len(params) else None
+            else:
+                pattern = value[1:-1].replace("''", "'")
+            if not isinstance(pattern, str):
+                return match.group(0)
+            matches = self.estimate_matches(conn, column.lower(), pattern)
+            if matches is None or matches > max_share * total:
+                return match.group(0)
+            return f"{qualifier}rowid IN (SELECT rowid FROM products_fts WHERE {column} LIKE {value})"
+
+        return text_like.sub(replace, sql)
+
+    def check(self, conn, sql, params):
+        """
+        Reject anything but one SELECT, and nested-loop joins of unindexed full scans.
+
+        Two full table scans under the same plan node are a join where every
+        row of one table is compared with every row of the other. Scans in
+        separate subqueries or UNION arms run one after another and are
+        allowed; their cost is bounded by the query timeout.
+        """
+        if not re.match(r"\s*(SELECT|WITH)\b", sql, re.IGNORECASE) or ";" in string_literal.sub("", sql):
+            raise QueryRejected("only a single SELECT statement is allowed")
+        scans = {}
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+            detail = row["detail"]
+            # SCAN (even through an index) visits every row; SEARCH is an index lookup
+            if detail.startswith("SCAN") and not any(word in detail for word in ("CONSTANT ROW", "VIRTUAL TABLE")):
+                scans.setdefault(row["parent"], []).append(detail)
+        for siblings in scans.values():
+            if len(siblings) > 1:
+                raise QueryRejected(f"query plan joins full table scans: {'; '.join(siblings)}")
+
+    def records(self, sql, params = (), max_rows = None):
+        """
+        Run a read-only query.
+
+        Args:
+            sql: A single SELECT statement, optionally with ? placeholders
+            params: Values for the placeholders
+            max_rows: Row cap for this query (defaults to the pool's)
+
+        Returns:
+            list of row dicts, at most `max_rows` long
+
+        Raises:
+            QueryRejected: the statement or its plan failed the guard
+            sqlite3.OperationalError: the query ran longer than `timeout` seconds
+        """
+        sql = sql.strip().rstrip(";").strip()
+        with self.connection() as conn:
+            sql = self.rewrite(conn, sql, params)
+            try:
+                self.check(conn, sql, params)
+            except QueryRejected:
+                self._count("rejected")
+                raise
+
+            deadline = time.monotonic() + self.timeout
+            conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+            try:
+                # Closing parenthesis on its own line, so a trailing -- comment can't swallow it
+                rows = conn.execute(f"SELECT * FROM (\n{sql}\n) LIMIT ?", (*params, max_rows or self.max_rows)).fetchall()
+            except sqlite3.OperationalError as e:
+                if "interrupted" in str(e):
+                    self._count("timeouts")
+                raise
+            self._count("queries")
+            return [dict(row) for row in rows]
+
+
+def normalize_sql(sql):
+    """Lower-case SQL with collapsed whitespace outside string literals, without a trailing semicolon."""
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";").strip())
+    return "".join(part if part.startswith("'") else " ".join(part.lower().split()) for part in parts)
+
+
+class ResultCache:
+    """
+    LRU of query results keyed by normalized SQL and parameters.
+
+    Before every lookup the database version is read: PRAGMA data_version on
+    a dedicated read-only connection (changes when any other connection
+    commits) together with the file's mtime and inode (changes when the file
+    is replaced). Any change drops all cached results.
+    """
+
+    def __init__(self, db_path, max_entries = result_cache_size):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        self._version = self._read_version()
+
+    def _read_version(self):
+        stat = os.stat(self.db_path)
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, stat.st_mtime_ns, stat.st_ino
+
+    def _check_version(self):
+        version = self._read_version()
+        if version != self._version:
+            self._version = version
+            if self._entries:
+                self.stats["invalidations"] += 1
+                self._entries.clear()
+
+    def get(self, sql, params = ()):
+        """Cached rows for the query, or None."""
+        key = (normalize_sql(sql), tuple(params))
+        with self._lock:
+            self._check_version()
+            rows = self._entries.get(key)
+            if rows is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return list(rows)
+
+    def put(self, sql, params, rows):
+        key = (normalize_sql(sql), tuple(params))
+        with self._lock:
+            self._entries[key] = list(rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+
+if __name__ == "__main__":
+    import argparse
+    import statistics
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Compare LIKE scans with the FTS5 trigram index on a scaled-up catalog")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--source", default=str(Path(__file__).parent / "resources/product.db"))
+    args = parser.parse_args()
+
+    patterns = [("brand", "%nike%"), ("brand", "%skech%"), ("title", "%running%"), ("title", "%memory foam%")]
+    shapes = {
+        "count": "SELECT count(*) FROM products WHERE {column} LIKE ?",
+        "top5": "SELECT * FROM products WHERE {column} LIKE ? ORDER BY avg_rating DESC LIMIT 5"
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = Path(work_dir) / "products.db"
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("ATTACH DATABASE ? AS source", (f"{Path(args.source).resolve().as_uri()}?mode=ro",))
+            schema = conn.execute("SELECT sql FROM source.sqlite_master WHERE name = 'products'").fetchone()[0]
+            conn.execute(schema)
+            # Copy k of the catalog has every letter of title and brand shifted by k, so a grown
+            # catalog has many more distinct brands and a search term stays as selective as in a real one
+            conn.create_function("shift", 2, lambda text, k: text and "".join(
+                chr((ord(c) - 97 + k) % 26 + 97) if "a" <= c <= "z" else
+                chr((ord(c) - 65 + k) % 26 + 65) if "A" <= c <= "Z" else c
+                for c in text
+            ))
+            size = conn.execute("SELECT count(*) FROM source.products").fetchone()[0]
+            for k in range(-(-args.rows // size)):
+                conn.execute(
+                    "INSERT INTO products SELECT product_link, shift(title, ?), shift(brand, ?), price, discount, "
+                    "avg_rating, total_ratings FROM source.products", (k, k)
+                )
+            conn.execute("DELETE FROM products WHERE rowid > ?", (args.rows,))
+        conn.close()
+
+        start = time.perf_counter()
+        ensure_indexes(db_path)
+        print(f"{args.rows} rows, indexes + FTS built in {time.perf_counter() - start:.1f}s")
+
+        pool = ReadOnlyPool(db_path, size=1)
+        with pool.connection() as conn:
+            for column, pattern in patterns:
+                for shape, template in shapes.items():
+                    sql = template.format(column=column)
+                    timings = {}
+                    variants = (
+                        ("like", sql),
+                        ("fts", pool.rewrite(conn, sql, (pattern,), max_share=float("inf"))),
+                        ("auto", pool.rewrite(conn, sql, (pattern,)))
+                    )
+                    for name, query in variants:
+                        runs = []
+                        for _ in range(args.repeats):
+                            start = time.perf_counter()
+                            conn.execute(query, (pattern,)).fetchall()
+                            runs.append(time.perf_counter() - start)
+                        timings[name] = statistics.median(runs) * 1000
+                    print(f"{column} LIKE {pattern!r:16} {shape:5}  LIKE {timings['like']:8.2f} ms   "
+                          f"FTS {timings['fts']:8.2f} ms   auto {timings['auto']:8.2f} ms   "
+                          f"(LIKE/auto x{timings['like'] / timings['auto']:.1f})")
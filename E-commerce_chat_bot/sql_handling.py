@@ -1,20 +1,40 @@
 import sqlite3
-import pandas as pd
 from pathlib import Path
-from groq import Groq    
+from llm_client import chat_completion
 import os
 import re
 import streamlit as st
 from faq_handling import add_chat_history
+from sql_planner import brand_aliases, parse_question, template_cache, count, free_form_words
+from sql_engine import ReadOnlyPool, ResultCache, QueryRejected, ensure_indexes
 
 file_path = Path(__file__).parent if "__file__" in locals() else Path.cwd()
 db_path = str(file_path/"resources/product.db")
 
-def run_query(query):
-    if query.strip().upper().startswith("SELECT"):
-        with sqlite3.connect(db_path) as connector:
-            df = pd.read_sql_query(query, connector)
-            return df
+ensure_indexes(db_path)
+db_pool = ReadOnlyPool(db_path)
+result_cache = ResultCache(db_path)
+
+def run_query(query, params = ()):
+    """Run a SELECT through the result cache and read-only pool; returns row dicts, or None if it was rejected or failed."""
+    rows = result_cache.get(query, params)
+    if rows is not None:
+        return rows
+    try:
+        rows = db_pool.records(query, params)
+    except (QueryRejected, sqlite3.Error) as e:
+        print(f"SQL query failed: {e}")
+        return None
+    result_cache.put(query, params, rows)
+    return rows
+
+def load_brands():
+    """Brand names plus the single-word aliases of multi-word ones ("ajanta" for "Impakto by Ajanta")."""
+    names = [row["brand"] for row in db_pool.records("SELECT DISTINCT brand FROM products WHERE brand IS NOT NULL", max_rows = 10_000)]
+    titles = [(row["brand"], row["title"]) for row in db_pool.records("SELECT brand, title FROM products WHERE brand IS NOT NULL AND title IS NOT NULL", max_rows = 100_000)]
+    return names + brand_aliases(names, titles)
+
+brands = load_brands()
         
 
 
@@ -44,8 +64,9 @@ Instructions:
     -   For invalid queries: Enclose the message in <MESSAGE> tags (e.g., <MESSAGE>Please ask a question related to products, such as brand, price, or discount</MESSAGE>).
 5.  Do not provide any additional text or explanations outside the specified tags.
         '''
-    completion = Groq(api_key = GROQ_API_KEY).chat.completions.create(
-        model = GROQ_MODEL,
+    answer = chat_completion(
+        GROQ_API_KEY,
+        GROQ_MODEL,
         messages = [
             {
                 "role": "system",
@@ -58,7 +79,6 @@ Instructions:
         ],
         temperature = 0.2
     )
-    answer = completion.choices[0].message.content
     return answer
 
 
@@ -80,52 +100,95 @@ def data_comprehensive(question, context, GROQ_API_KEY, GROQ_MODEL):
     Output only the response in plain text, using the specified format for product-related questions or a natural sentence for others.
     '''
 
-    completion = Groq(api_key = GROQ_API_KEY).chat.completions.create(
-    model = GROQ_MODEL,
-    messages = [
-        {
-            "role": "system",
-            "content" : comprehension_prompt
-        },
-        {
-            "role": "user",
-            "content": f"question: {question} Data: {context} "
-        }
-    ],
+    answer = chat_completion(
+        GROQ_API_KEY,
+        GROQ_MODEL,
+        messages = [
+            {
+                "role": "system",
+                "content" : comprehension_prompt
+            },
+            {
+                "role": "user",
+                "content": f"question: {question} Data: {context} "
+            }
+        ],
         temperature = 0.2
     )
-    answer = completion.choices[0].message.content
     return answer
 
 
+product_fields = {"title", "price", "discount", "avg_rating", "product_link"}
+answer_stats = {"template": 0, "llm": 0}
+
+def is_product_list(question, rows):
+    """True when the rows are plain product records and the question just asks to see them."""
+    return all(product_fields <= row.keys() for row in rows) and not free_form_words.search(question)
+
+def render_product_list(rows, max_products = 5):
+    """
+    Format product rows the way the data_comprehensive prompt specifies, without the LLM.
+
+    Up to `max_products` products sorted by avg_rating (highest first), e.g.
+    1. Air Max: Rs. 5999 (20% off), Rating: 4.5, Link: http://example.com/nike1
+    """
+    if not rows:
+        return "No products found matching the criteria."
+    ranked = sorted(rows, key = lambda row: row["avg_rating"] or 0, reverse = True)[:max_products]
+    return "\n".join(
+        f"{i}. {row['title']}: Rs. {row['price']} ({round((row['discount'] or 0) * 100)}% off), "
+        f"Rating: {row['avg_rating']}, Link: {row['product_link']}"
+        for i, row in enumerate(ranked, 1)
+    )
+
 def sql_chain_with_history(question, GROQ_API_KEY, GROQ_MODEL, session_id = "default"):
     """SQL chain with chat history support"""
     
-    # Generate SQL query
-    sql_query = generate_sql_query(question, GROQ_API_KEY, GROQ_MODEL)
-   
-    pattern = "<SQL>(.*?)</SQL>"
-    matches = re.findall(pattern, sql_query, re.DOTALL)
-    
-    if len(matches) == 0:
-        # No SQL query generated, return the message
-        pattern_msg = "<MESSAGE>(.*?)</MESSAGE>"
-        msg_matches = re.findall(pattern_msg, sql_query, re.DOTALL)
-        if msg_matches:
-            response = msg_matches[0].strip()
-        else:
-            response = "Sorry, I couldn't generate a query for your question."
-        return response
-    
+    # Formulaic questions are parsed by rules, reworded ones reuse an earlier LLM query
+    generated = False
+    planned = parse_question(question, brands)
+    if planned:
+        count("rule")
+    else:
+        planned = template_cache.get(question, brands)
+        if planned:
+            count("template_cache")
+
+    if planned is None:
+        # Generate SQL query
+        count("llm")
+        sql_query = generate_sql_query(question, GROQ_API_KEY, GROQ_MODEL)
+
+        pattern = "<SQL>(.*?)</SQL>"
+        matches = re.findall(pattern, sql_query, re.DOTALL)
+
+        if len(matches) == 0:
+            # No SQL query generated, return the message
+            pattern_msg = "<MESSAGE>(.*?)</MESSAGE>"
+            msg_matches = re.findall(pattern_msg, sql_query, re.DOTALL)
+            if msg_matches:
+                response = msg_matches[0].strip()
+            else:
+                response = "Sorry, I couldn't generate a query for your question."
+            return response
+        planned = (matches[0].strip(), ())
+        generated = True
+
     # Execute the SQL query
-    response = run_query(matches[0].strip())
+    response = run_query(*planned)
+    if response is not None and generated:
+        template_cache.put(question, brands, planned[0])
     if response is None:
         error_msg = "Sorry, there was a problem executing SQL query"
         return error_msg
     
-    # Generate comprehensive response
-    context = response.to_dict(orient = "records")
-    answer = data_comprehensive(question, context, GROQ_API_KEY, GROQ_MODEL)
+    # Plain product lists are formatted locally; aggregates and free-form questions go to the LLM
+    if not response or is_product_list(question, response):
+        answer_stats["template"] += 1
+        answer = render_product_list(response)
+    else:
+        answer_stats["llm"] += 1
+        answer = data_comprehensive(question, response, GROQ_API_KEY, GROQ_MODEL)
     
     # Update history
     add_chat_history(session_id, "user", question)
@@ -0,0 +1,313 @@
+import re
+import threading
+from collections import OrderedDict
+
+default_limit = 5
+max_limit = 50
+template_cache_size = 500
+
+# Words in product titles worth filtering on
+categories = [
+    "running", "walking", "jogging", "gym", "sports", "training", "sneakers", "casual",
+    "formal", "party", "boots", "loafers", "sandals", "slippers", "trekking", "hiking"
+]
+
+# Words that don't change what is being asked for
+filler_words = set("""
+    a an the i im i'm we me my you your do does is are was there any some all which what whats
+    what's can could would please want wanna need looking look for to buy get give show list
+    find see have has having with of in on at from by and or that those these it its only also
+    shoe shoes footwear pair pairs product products item items option options brand brands
+    available price prices cost costs priced rs rs. inr rupees ₹ one ones good nice new
+    tell about how much range
+""".split())
+
+# Questions that need aggregation, comparison or explanation rather than a list of rows
+free_form_words = re.compile(
+    r"\b(average|mean|how many|count|total|sum|number of|compare|comparison|difference|versus|vs|better|why|explain)\b",
+    re.IGNORECASE
+)
+
+planner_stats = {"rule": 0, "template_cache": 0, "llm": 0}
+_stats_lock = threading.Lock()
+
+NUMBER = r"(?:rs\.?|inr|₹)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k)?"
+
+
+def to_number(digits, thousands = None):
+    value = float(digits.replace(",", ""))
+    return value * 1000 if thousands else value
+
+
+def count(kind):
+    with _stats_lock:
+        planner_stats[kind] += 1
+
+
+def sql_route_stats():
+    """Counts of SQL produced by rules, the template cache and the LLM, plus the share that skipped the LLM."""
+    with _stats_lock:
+        stats = dict(planner_stats)
+    total = sum(stats.values())
+    stats["llm_avoided_rate"] = round((stats["rule"] + stats["template_cache"]) / total, 4) if total else 0.0
+    return stats
+
+
+def brand_aliases(brands, titles):
+    """
+    Single words of multi-word brand names that can stand for the brand.
+
+    "ajanta" is an alias of "Impakto by Ajanta", but words that also appear
+    in the titles of other brands' products ("black", "soft") or are filler
+    ("new", "by") are not, since they usually describe the product instead.
+
+    Args:
+        brands: Brand names
+        titles: (brand, title) pairs of the products
+
+    Returns:
+        list of alias words, lowercase
+    """
+    owners = {}
+    for brand in brands:
+        words = brand.lower().split()
+        if len(words) > 1:
+            for word in words:
+                if len(word) >= 3 and word not in filler_words:
+                    owners.setdefault(word, set()).add(brand)
+    aliases = []
+    for word, owned_by in owners.items():
+        pattern = re.compile(r"(?<![\w])" + re.escape(word) + r"(?![\w])")
+        if not any(brand not in owned_by and pattern.search(title.lower()) for brand, title in titles):
+            aliases.append(word)
+    return sorted(aliases)
+
+
+def find_brands(text, brands):
+    """
+    Brand names or aliases mentioned in `text` (longest first), and the text with them removed.
+
+    They are matched against the brand column as substrings, like the LLM's
+    brand LIKE '%nike%'.
+    """
+    found = []
+    for brand in sorted(brands, key=len, reverse=True):
+        pattern = r"(?<![\w])" + re.escape(brand.lower()) + r"(?![\w])"
+        if re.search(pattern, text):
+            found.append(brand)
+            text = re.sub(pattern, " ", text)
+    return found, text
+
+
+def parse_question(question, brands):
+    """
+    Turn a formulaic product question into parameterized SQL without the LLM.
+
+    Recognizes brands, price bounds and ranges, discount bounds ("50% off",
+    "up to 30% off", "on sale"), minimum rating, title keywords (running, sneakers, for men...),
+    ordering (cheapest, top rated, biggest discount) and "top N". Any other
+    word that isn't filler, or any counting/aggregate wording ("how many",
+    "average"), means the question isn't a plain listing and None is
+    returned, so the LLM handles it. Brands are matched after the price,
+    discount and ordering phrases are cut out, so the brand "MAX" isn't
+    read from "max discount" or "max 20% off".
+
+    Returns:
+        (sql, params) or None
+    """
+    if free_form_words.search(question):
+        return None
+    text = " " + question.lower().replace("’", "'") + " "
+    where, params, order, limit = [], [], None, default_limit
+
+    def take(pattern):
+        """Search for `pattern` and cut the match out of the text."""
+        nonlocal text
+        match = re.search(pattern, text)
+        if match:
+            text = text[:match.start()] + " " + text[match.end():]
+        return match
+
+    # Ratings and discounts first, so their numbers aren't read as prices
+    match = (
+        take(r"(?:rat(?:ing|ed)|stars?)\s*(?:of\s*)?(?:above|over|at least|more than|>=?)?\s*(\d(?:\.\d+)?)\s*(?:\+|stars?|and above|or (?:more|above|higher))?")
+        or take(r"(?<![\d.])(\d(?:\.\d+)?)\s*(?:\+|and above|or (?:more|above|higher))?\s*(?:stars?|rat(?:ing|ed))")
+    )
+    if match:
+        where.append("avg_rating >= ?")
+        params.append(float(match.group(1)))
+    if take(r"(?:top|best|highest|highly)[\s-]rated|(?:best|highest) ratings?"):
+        order = "avg_rating DESC"
+
+    match = (
+        take(r"(?:max(?:imum)?|up ?to|upto|at most|not more than|less than|under|below)\s*(?<![\d.])(\d{1,2})\s*%\s*(?:discount|off)")
+        or take(r"(?:discount|off)\s*(?:of\s*)?(?:max(?:imum)?|up ?to|upto|at most|not more than|less than|under|below)\s*(?<![\d.])(\d{1,2})\s*%")
+    )
+    if match:
+        where.append("discount <= ?")
+        params.append(int(match.group(1)) / 100)
+    upper = match
+    match = (
+        take(r"(?:at least |above |over |more than |minimum |min )?(?<![\d.])(\d{1,2})\s*%\s*(?:or more\s*)?(?:discount|off)")
+        or take(r"(?:discount|off)\s*(?:of\s*)?(?:at least |above |over |more than )?(?<![\d.])(\d{1,2})\s*%")
+    )
+    if match:
+        where.append("discount >= ?")
+        params.append(int(match.group(1)) / 100)
+    if take(r"(?:highest|biggest|best|maximum|max) discounts?|best deals?"):
+        order = "discount DESC"
+    elif not (match or upper) and take(r"on sale|discounted|with (?:a |any )?discounts?|any discounts?|offers?|deals?|discounts?"):
+        where.append("discount > 0")
+
+    match = take(r"(?:top|best|first|show(?: me)?|list|give me)\s+(\d{1,3})(?![\d,.%]|\s*k\b)")
+    if match:
+        limit = min(int(match.group(1)), max_limit)
+
+    match = take(r"(?:between|from)\s*" + NUMBER + r"\s*(?:and|to|-)\s*" + NUMBER)
+    if match:
+        where.append("price BETWEEN ? AND ?")
+        params.extend([to_number(match.group(1), match.group(2)), to_number(match.group(3), match.group(4))])
+    match = take(r"(?:under|below|less than|within|upto|up to|cheaper than|maximum|max|not more than|<=?)(?:\s*max(?:imum)?)?\s*" + NUMBER)
+    if match:
+        where.append("price <= ?")
+        params.append(to_number(match.group(1), match.group(2)))
+    match = take(r"(?:above|over|more than|greater than|at least|minimum|min|>=?)\s*" + NUMBER)
+    if match:
+        where.append("price >= ?")
+        params.append(to_number(match.group(1), match.group(2)))
+
+    if take(r"cheapest|lowest price|least expensive|low to high|budget"):
+        order = "price ASC"
+    elif take(r"most expensive|highest price|costliest|high to low"):
+        order = "price DESC"
+
+    found, text = find_brands(text, brands)
+    if found:
+        where.append("(" + " OR ".join("brand LIKE ?" for _ in found) + ")")
+        params.extend(f"%{brand}%" for brand in found)
+
+    if take(r"for (?:men|man|boys?)\b|\bmen'?s\b|\bmens\b"):
+        where.append("title LIKE ?")
+        params.append("%for men%")
+    if take(r"for (?:women|woman|ladies|girls?)\b|\bwomen'?s\b|\bladies\b"):
+        where.append("title LIKE ?")
+        params.append("%for women%")
+    for word in categories:
+        if take(r"\b" + word + r"\b"):
+            where.append("title LIKE ?")
+            params.append(f"%{word}%")
+
+    if not where and order is None:
+        return None
+    leftover = [w for w in re.findall(r"[^\s?!,.:;]+", text) if w not in filler_words]
+    if leftover:
+        return None
+
+    sql = "SELECT * FROM products"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order or 'avg_rating DESC'} LIMIT ?"
+    return sql, params + [limit]
+
+
+def normalize_question(question, brands):
+    """
+    Question shape used as the template-cache key, plus the values pulled out of it.
+
+    Brand names become <brand> and numbers become <n>, so "nike under 3000"
+    and "puma under 5000" share a key.
+    """
+    text = " " + re.sub(r"[^\w%.₹ ]+", " ", question.lower()) + " "
+    found, _ = find_brands(text, brands)
+    values = {"brand": None, "numbers": []}
+    if len(found) == 1:
+        values["brand"] = found[0]
+        text = re.sub(r"(?<![\w])" + re.escape(found[0].lower()) + r"(?![\w])", " <brand> ", text)
+    values["numbers"] = [to_number(d, k) for d, k in re.findall(r"(\d[\d,]*(?:\.\d+)?)\s*(k)?\b", text)]
+    text = re.sub(r"\d[\d,]*(?:\.\d+)?\s*k?\b", " <n> ", text)
+    return " ".join(text.replace(".", " ").split()), values
+
+
+def make_template(sql, values):
+    """
+    Replace the question's values in LLM-generated SQL by ? placeholders.
+
+    String literals become parameters, with the brand as a slot when they
+    contain it; numeric literals equal to a question number (or to it as a
+    percentage) become number slots. Returns (template_sql, slots), or None
+    when a question value isn't found exactly once in the SQL, since the
+    query then can't be safely reused for other values.
+    """
+    brand = (values["brand"] or "").lower()
+    slots = []
+    used = {"brand": 0, "numbers": [0] * len(values["numbers"])}
+
+    def replace(match):
+        literal, number = match.group(1), match.group(2)
+        if literal is not None:
+            literal = literal.replace("''", "'")
+            start = literal.lower().find(brand) if brand else -1
+            if start >= 0:
+                used["brand"] += 1
+                slots.append(("brand", literal[:start] + "{brand}" + literal[start + len(brand):]))
+            else:
+                slots.append(("literal", literal))
+            return "?"
+        for i, n in enumerate(values["numbers"]):
+            for scale in (1, 0.01):
+                if abs(n * scale - float(number)) < 1e-9:
+                    used["numbers"][i] += 1
+                    slots.append(("number", (i, scale)))
+                    return "?"
+        return number
+
+    template = re.sub(r"'((?:[^']|'')*)'|(?<![\w.])(\d+(?:\.\d+)?)(?![\w.])", replace, sql)
+    if (brand and used["brand"] != 1) or any(uses != 1 for uses in used["numbers"]):
+        return None
+    return template, slots
+
+
+def fill_template(template, values):
+    sql, slots = template
+    params = []
+    for kind, spec in slots:
+        if kind == "brand":
+            params.append(spec.replace("{brand}", values["brand"]))
+        elif kind == "number":
+            i, scale = spec
+            params.append(values["numbers"][i] * scale)
+        else:
+            params.append(spec)
+    return sql, params
+
+
+class TemplateCache:
+    """LRU of normalized question -> parameterized SQL template learned from LLM output."""
+
+    def __init__(self, max_entries = template_cache_size):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, question, brands):
+        key, values = normalize_question(question, brands)
+        with self._lock:
+            template = self._entries.get(key)
+            if template is None:
+                return None
+            self._entries.move_to_end(key)
+        return fill_template(template, values)
+
+    def put(self, question, brands, sql):
+        key, values = normalize_question(question, brands)
+        template = make_template(sql, values)
+        if template is None:
+            return
+        with self._lock:
+            self._entries[key] = template
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+template_cache = TemplateCache()
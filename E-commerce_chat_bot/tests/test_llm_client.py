@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import groq
+import pytest
+
+import llm_client
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers chat completions with the server's scripted (status, headers) responses, in order."""
+
+    protocol_version = "HTTP/1.1"       # keep-alive, so connection reuse is visible
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.connections.append(self.client_address)
+        status, headers = self.server.script.pop(0)
+        if status == 200:
+            body = {
+                "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "hello"}}]
+            }
+        else:
+            body = {"error": {"message": f"status {status}", "type": "stub"}}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in {"Content-Type": "application/json", "Content-Length": str(len(data)), **headers}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    server.connections = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(llm_client, "groq_base_url", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(llm_client, "backoff_base", 0.01)
+    monkeypatch.setattr(llm_client, "limiter", llm_client.RateLimiter())
+    monkeypatch.setattr(llm_client, "_clients", {})
+    monkeypatch.setattr(llm_client, "stats", dict.fromkeys(llm_client.stats, 0))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def ask():
+    return llm_client.chat_completion("test-key", "stub", [{"role": "user", "content": "hi"}])
+
+
+def test_retries_429_then_5xx_then_succeeds_on_one_connection(server):
+    server.script = [(429, {"retry-after": "0.3"}), (503, {}), (200, {})]
+    start = time.monotonic()
+    assert ask() == "hello"
+    assert time.monotonic() - start >= 0.3        # waited out retry-after
+    assert llm_client.stats == {"requests": 3, "retries": 2, "rate_limited": 1, "errors": 0}
+    assert len(set(server.connections)) == 1      # same keep-alive connection for every attempt
+
+
+def test_gives_up_after_max_retries(server, monkeypatch):
+    monkeypatch.setattr(llm_client, "max_retries", 1)
+    server.script = [(500, {}), (502, {})]
+    with pytest.raises(groq.InternalServerError):
+        ask()
+    assert llm_client.stats["errors"] == 1 and llm_client.stats["requests"] == 2
+
+
+def test_client_errors_are_not_retried(server):
+    server.script = [(400, {})]
+    with pytest.raises(groq.BadRequestError):
+        ask()
+    assert llm_client.stats["requests"] == 1 and llm_client.stats["retries"] == 0
+
+
+def test_exhausted_quota_header_pauses_later_requests(server):
+    server.script = [(200, {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "300ms"}), (200, {})]
+    ask()
+    start = time.monotonic()
+    ask()
+    assert time.monotonic() - start >= 0.25
+
+
+def test_paused_limiter_leaves_slots_free():
+    limiter = llm_client.RateLimiter(max_concurrent = 1)
+    limiter.pause(0.3)
+    waiter = threading.Thread(target=lambda: limiter.__enter__() and limiter.__exit__())
+    waiter.start()
+    time.sleep(0.05)
+    assert limiter._slots.acquire(blocking = False)     # the waiting request doesn't hold the only slot
+    limiter._slots.release()
+    waiter.join()
@@ -0,0 +1,130 @@
+import pytest
+
+from sql_planner import brand_aliases, fill_template, make_template, normalize_question, parse_question
+
+brands = ["NIKE", "PUMA", "MAX", "Bata", "Red Tape"]
+
+
+def test_brand_and_price_bound():
+    sql, params = parse_question("nike shoes under 3000", brands)
+    assert sql == (
+        "SELECT * FROM products WHERE price <= ? AND (brand LIKE ?) "
+        "ORDER BY avg_rating DESC LIMIT ?"
+    )
+    assert params == [3000.0, "%NIKE%", 5]
+
+
+def test_price_range_with_thousands():
+    sql, params = parse_question("puma shoes between 2k and 4,500", brands)
+    assert "price BETWEEN ? AND ?" in sql
+    assert params == [2000.0, 4500.0, "%PUMA%", 5]
+
+
+def test_discount_rating_and_top_n():
+    sql, params = parse_question("top 10 shoes with 40% off rated 4 stars", brands)
+    assert "avg_rating >= ?" in sql and "discount >= ?" in sql
+    assert params == [4.0, 0.4, 10]
+
+
+def test_multiword_brand_category_and_order():
+    sql, params = parse_question("cheapest red tape running shoes for men", brands)
+    assert sql.endswith("ORDER BY price ASC LIMIT ?")
+    assert params == ["%Red Tape%", "%for men%", "%running%", 5]
+
+
+@pytest.mark.parametrize("question", [
+    "How many Nike shoes under 3000 are there?",
+    "how many puma shoes",
+    "average price of puma shoes",
+    "total number of bata sandals",
+    "compare nike and puma running shoes",
+])
+def test_aggregate_questions_go_to_llm(question):
+    assert parse_question(question, brands) is None
+
+
+def test_unknown_words_go_to_llm():
+    assert parse_question("nike shoes in size 9", brands) is None
+    assert parse_question("hello there", brands) is None
+
+
+def test_max_discount_is_not_the_max_brand():
+    sql, params = parse_question("nike shoes with max discount", brands)
+    assert "ORDER BY discount DESC" in sql
+    assert params == ["%NIKE%", 5]
+
+
+def test_under_max_price_is_not_the_max_brand():
+    sql, params = parse_question("puma shoes under max 2000", brands)
+    assert params == [2000.0, "%PUMA%", 5]
+
+
+def test_max_brand_still_recognized():
+    _, params = parse_question("max shoes under 2000", brands)
+    assert params == [2000.0, "%MAX%", 5]
+    sql, params = parse_question("max shoes with max discount", brands)
+    assert "ORDER BY discount DESC" in sql and params == ["%MAX%", 5]
+
+
+def test_max_percent_off_is_an_upper_bound_not_the_max_brand():
+    sql, params = parse_question("nike shoes with max 20% discount", brands)
+    assert sql == (
+        "SELECT * FROM products WHERE discount <= ? AND (brand LIKE ?) "
+        "ORDER BY avg_rating DESC LIMIT ?"
+    )
+    assert params == [0.2, "%NIKE%", 5]
+    _, params = parse_question("puma shoes up to 30% off", brands)
+    assert params == [0.3, "%PUMA%", 5]
+
+
+def test_latest_is_not_filler():
+    assert parse_question("latest nike shoes", brands) is None
+
+
+def test_brand_alias_matches_as_substring():
+    titles = [
+        ("Impakto by Ajanta", "Impakto Men's Black Sandals"),
+        ("Black Beatle", "Black Beatle Leather Boots"),
+        ("NIKE", "Nike Black Running Shoes"),
+    ]
+    aliases = brand_aliases(["Impakto by Ajanta", "Black Beatle", "NIKE"], titles)
+    assert aliases == ["ajanta", "beatle", "impakto"]
+    sql, params = parse_question("ajanta sandals", brands + aliases)
+    assert "(brand LIKE ?)" in sql
+    assert params == ["%ajanta%", "%sandals%", 5]
+
+
+def test_normalize_question_shares_key_across_values():
+    key, values = normalize_question("Nike shoes under 3000?", brands)
+    other_key, other_values = normalize_question("puma shoes under 5k", brands)
+    assert key == other_key == "<brand> shoes under <n>"
+    assert values == {"brand": "NIKE", "numbers": [3000.0]}
+    assert other_values == {"brand": "PUMA", "numbers": [5000.0]}
+
+
+def test_make_template_and_fill_template_round_trip():
+    _, values = normalize_question("nike shoes under 3000 with 20% discount", brands)
+    sql = "SELECT * FROM products WHERE brand LIKE '%Nike%' AND price <= 3000 AND discount >= 0.2 LIMIT 5"
+    template = make_template(sql, values)
+    assert template[0] == "SELECT * FROM products WHERE brand LIKE ? AND price <= ? AND discount >= ? LIMIT 5"
+
+    _, new_values = normalize_question("puma shoes under 4500 with 30% discount", brands)
+    filled_sql, params = fill_template(template, new_values)
+    assert filled_sql == template[0]
+    assert params[0] == "%PUMA%"
+    assert params[1] == 4500.0
+    assert params[2] == pytest.approx(0.3)
+
+
+def test_make_template_keeps_other_literals():
+    _, values = normalize_question("nike shoes under 3000", brands)
+    template = make_template("SELECT * FROM products WHERE brand = 'Nike' AND title LIKE '%men%' AND price < 3000", values)
+    sql, params = fill_template(template, {"brand": "PUMA", "numbers": [1000.0]})
+    assert sql == "SELECT * FROM products WHERE brand = ? AND title LIKE ? AND price < ?"
+    assert params == ["PUMA", "%men%", 1000.0]
+
+
+def test_make_template_rejects_ambiguous_values():
+    _, values = normalize_question("nike shoes under 3000", brands)
+    assert make_template("SELECT * FROM products WHERE price < 3000 OR price = 3000", values) is None
+    assert make_template("SELECT * FROM products WHERE price < 3000", values) is None
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from embedding_service import get_service
+
+top_k = 5                       # utterances considered per query, as in SemanticRouter
+default_score_threshold = 0.5   # used for routes without their own score_threshold (RouterEncoder's default)
+decision_cache_size = 1024      # recent query -> route decisions kept
+
+RouteChoice = namedtuple("RouteChoice", ["name", "similarity_score"], defaults=[None, None])
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class VectorRouter:
+    """
+    Drop-in replacement for SemanticRouter that scores with one matrix product.
+
+    Utterance embeddings of every route are normalized once and stacked into
+    a single matrix, so a batch of queries is scored against all routes with
+    one NumPy matmul. The decision rule is SemanticRouter's: take the
+    `top_k` most similar utterances, average their scores per route, and
+    return the best-scoring route whose mean reaches its `score_threshold`
+    (a RouteChoice with name None if none does). Decisions for recent
+    queries are kept in an LRU.
+    """
+
+    def __init__(self, routes, embed = None, top_k = top_k, score_threshold = default_score_threshold,
+                 cache_size = decision_cache_size):
+        self.routes = list(routes)
+        self.embed = embed or (lambda texts: get_service().embed(texts))
+        self.top_k = top_k
+        self.thresholds = np.array([
+            route.score_threshold if route.score_threshold is not None else score_threshold
+            for route in self.routes
+        ], dtype=np.float32)
+        self.cache_size = cache_size
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        utterances = [u for route in self.routes for u in route.utterances]
+        self.route_index = np.array([i for i, route in enumerate(self.routes) for _ in route.utterances])
+        self.matrix = normalize_rows(self.embed(utterances))
+
+    def _decide(self, scores):
+        """Route choices for a (queries x utterances) similarity matrix."""
+        k = min(self.top_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        top_routes = self.route_index[top]
+
+        choices = []
+        for route_ids, values in zip(top_routes, top_scores):
+            counts = np.bincount(route_ids, minlength=len(self.routes))
+            means = np.bincount(route_ids, weights=values, minlength=len(self.routes)) / np.maximum(counts, 1)
+            choice = RouteChoice()
+            for i in sorted(np.flatnonzero(counts), key=lambda i: -means[i]):
+                if not self.thresholds[i] or means[i] >= self.thresholds[i]:
+                    choice = RouteChoice(self.routes[i].name, float(means[i]))
+                    break
+            choices.append(choice)
+        return choices
+
+    def route_batch(self, queries):
+        """
+        Route several queries with one embedding call and one matrix product.
+
+        Args:
+            queries: Query strings
+
+        Returns:
+            List of RouteChoice, in the order of `queries`
+        """
+        queries = list(queries)
+        decisions = {}
+        with self._lock:
+            for query in queries:
+                if query in self._cache:
+                    self._cache.move_to_end(query)
+                    decisions[query] = self._cache[query]
+                    self.stats["hits"] += 1
+                elif query not in decisions:
+                    decisions[query] = None
+                    self.stats["misses"] += 1
+        missing = [query for query, choice in decisions.items() if choice is None]
+
+        if missing:
+            scores = normalize_rows(self.embed(missing)) @ self.matrix.T
+            with self._lock:
+                for query, choice in zip(missing, self._decide(scores)):
+                    decisions[query] = choice
+                    if self.cache_size:
+                        self._cache[query] = choice
+                        self._cache.move_to_end(query)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                    self.stats["evictions"] += 1
+        return [decisions[query] for query in queries]
+
+    def __call__(self, query):
+        return self.route_batch([query])[0]
+
+
+# Held-out questions (none of them are route utterances) used to compare routers
+labeled_queries = [
+    ("Can I return shoes I bought last week?", "faq"),
+    ("How do I get my money back for a cancelled order?", "faq"),
+    ("Is cash on delivery available?", "faq"),
+    ("Where is my package right now?", "faq"),
+    ("Do you ship to Canada?", "faq"),
+    ("Which bank cards give extra discount?", "faq"),
+    ("How many days does a refund take?", "faq"),
+    ("Is there a festive sale going on?", "faq"),
+    ("Can I pay with UPI?", "faq"),
+    ("What is your exchange policy?", "faq"),
+    ("Show me adidas sneakers under 2000", "sql"),
+    ("Which Nike running shoes are the cheapest?", "sql"),
+    ("Top 5 highest rated shoes for women", "sql"),
+    ("Any Reebok shoes with more than 30% off?", "sql"),
+    ("I want formal shoes for men below Rs. 4000", "sql"),
+    ("Price of Bata loafers?", "sql"),
+    ("List sports shoes rated above 4 stars", "sql"),
+    ("Do you have Campus walking shoes in stock?", "sql"),
+    ("Cheapest Puma sneakers please", "sql"),
+    ("Sandals between 500 and 1000 rupees", "sql"),
+    ("Hey", "small_talk"),
+    ("Good evening!", "small_talk"),
+    ("Hello, how is it going?", "small_talk"),
+    ("Thanks a lot", "small_talk"),
+    ("That was really helpful, thank you", "small_talk"),
+    ("What's your name?", "small_talk"),
+    ("Can you assist me?", "small_talk"),
+    ("Bye, have a nice day", "small_talk"),
+    ("You are great", "small_talk"),
+    ("Hi!", "small_talk"),
+]
+
+
+def benchmark(route_one, queries, repeats = 3):
+    """Accuracy and per-query latency (ms) of a callable returning a RouteChoice-like object."""
+    latencies, correct = [], 0
+    for _ in range(repeats):
+        for query, expected in queries:
+            start = time.perf_counter()
+            name = route_one(query).name
+            latencies.append((time.perf_counter() - start) * 1000)
+            correct += name == expected
+    latencies.sort()
+    return {
+        "accuracy": round(correct / (len(queries) * repeats), 4),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3)
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from semantic_router.routers import SemanticRouter
+
+    from embedding_service import RouterEncoder
+    from query_router import routes
+
+    parser = argparse.ArgumentParser(description="Compare VectorRouter with SemanticRouter on labeled queries")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    get_service().memo_size = 0         # every call pays for its query embedding
+    semantic = SemanticRouter(encoder=RouterEncoder(), routes=routes, auto_sync="local")
+    uncached = VectorRouter(routes, cache_size=0)
+    cached = VectorRouter(routes)
+
+    agreement = sum(semantic(q).name == uncached(q).name for q, _ in labeled_queries) / len(labeled_queries)
+    print(f"decision agreement with SemanticRouter: {agreement:.2%}")
+    print(f"SemanticRouter:           {benchmark(semantic, labeled_queries, args.repeats)}")
+    print(f"VectorRouter (no cache):  {benchmark(uncached, labeled_queries, args.repeats)}")
+    print(f"VectorRouter (cached):    {benchmark(cached, labeled_queries, args.repeats)}")
+
+    queries = [q for q, _ in labeled_queries]
+    start = time.perf_counter()
+    uncached.route_batch(queries)
+    print(f"VectorRouter.route_batch: {(time.perf_counter() - start) * 1000 / len(queries):.3f} ms/query "
+          f"({len(queries)} queries in one call)")